@@ -0,0 +1,78 @@
+"""
+Recall@k and latency of the IVF shortlist against the exact embedding scan used by
+Logic.predict_artworks.
+
+    python benchmarks/bench_ann.py --size 20000 --k 10 --shortlist 300 --probe-fraction 0.3
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.ann_index import IVFIndex, l2_normalize
+from src.config import Config
+from utils.get_walls_artwork_pairs import load_embeddings
+
+
+def synthetic_catalog(base: np.ndarray, size: int, noise: float = 0.05, seed: int = 0) -> np.ndarray:
+    """Grow the cached art embeddings to `size` rows by jittering real vectors."""
+    rng = np.random.default_rng(seed)
+    rows = base[rng.integers(0, len(base), size)]
+    return l2_normalize(rows + noise * rng.standard_normal(rows.shape).astype(np.float32))
+
+
+def exact_top_k(vectors, query, seen_rows, k):
+    scores = vectors @ query
+    scores[seen_rows] = -np.inf
+    return np.argsort(-scores)[:k]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--art-path", default=Config.art_embeddings_path)
+    parser.add_argument("--size", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--shortlist", type=int, default=Config.ann_shortlist)
+    parser.add_argument("--n-lists", type=int, default=Config.ann_n_lists)
+    parser.add_argument("--n-probe", type=int, default=Config.ann_n_probe)
+    parser.add_argument("--probe-fraction", type=float, default=Config.ann_probe_fraction)
+    args = parser.parse_args()
+
+    _, art_embeddings = load_embeddings(art_path=args.art_path)
+    vectors = synthetic_catalog(np.stack(list(art_embeddings.values())), args.size)
+    ids = np.arange(len(vectors))
+
+    start = time.perf_counter()
+    index = IVFIndex(n_lists=args.n_lists, n_probe=args.n_probe, probe_fraction=args.probe_fraction, min_size=0)
+    index.build(ids, vectors)
+    print(f"build: {time.perf_counter() - start:.2f}s")
+
+    rng = np.random.default_rng(1)
+    recalls, exact_times, ann_times = [], [], []
+    for _ in range(args.queries):
+        seen = rng.choice(len(vectors), 12, replace=False)
+        liked, disliked = seen[:8], seen[8:]
+        query = l2_normalize(vectors[liked].mean(axis=0)) - l2_normalize(vectors[disliked].mean(axis=0))
+
+        start = time.perf_counter()
+        exact = exact_top_k(vectors, query, seen, args.k)
+        exact_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        shortlist = index.search(query, k=args.shortlist + len(seen))
+        shortlist = np.setdiff1d(shortlist.astype(np.int64), seen)
+        ann_times.append(time.perf_counter() - start)
+
+        recalls.append(len(np.intersect1d(exact, shortlist)) / args.k)
+
+    print(f"catalog={len(vectors)} lists={index.centroids.shape[0]} probed={index.lists_probed} shortlist={args.shortlist}")
+    print(f"recall@{args.k}: {np.mean(recalls):.4f} (min {np.min(recalls):.2f})")
+    print(f"exact scan: {1000 * np.median(exact_times):.3f} ms/query")
+    print(f"ivf search: {1000 * np.median(ann_times):.3f} ms/query")
+
+
+if __name__ == "__main__":
+    main()
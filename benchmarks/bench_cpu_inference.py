@@ -0,0 +1,117 @@
+"""
+Latency and accuracy drift of the CPU inference modes (src/cpu_inference.py) against fp32.
+
+    python benchmarks/bench_cpu_inference.py --images data/sample_images --threads 4
+    python benchmarks/bench_cpu_inference.py --skip-clip      # wall MLP only
+
+CLIP: ms per image (batched) and cosine similarity of each embedding to the fp32 one.
+Wall MLP: ms per wall scored against --arts artworks, max |score - fp32 score| and
+overlap of the top-30 with the fp32 top-30.
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import torch
+from PIL import Image
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.config import Config
+from src.cpu_inference import CPU_INFERENCE_MODES, optimize_for_cpu, set_torch_threads
+
+
+def timed(fn, repeats=3):
+    fn()  # warm-up (and compilation for 'compile')
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def load_images(directory, n_images):
+    if directory:
+        paths = sorted(os.path.join(directory, name) for name in os.listdir(directory))[:n_images]
+        return [Image.open(path).convert("RGB") for path in paths]
+    rng = np.random.default_rng(0)
+    return [Image.fromarray(rng.integers(0, 255, (336, 336, 3), dtype=np.uint8)) for _ in range(n_images)]
+
+
+def bench_clip(modes, images, batch_size):
+    from utils.embed_model import ClipEmbed
+    Config.embedding_cache_enabled = False
+    Config.clip_cpu_inference_mode = "fp32"
+    clip = ClipEmbed()
+    if clip.device != "cpu":
+        print(f"CLIP runs on {clip.device}; the CPU modes only apply on cpu nodes")
+    tensors = [clip.preprocess(image) for image in images]
+    fp32_visual = clip.model.visual
+
+    def encode():
+        return np.concatenate([clip.encode_tensors(tensors[i:i + batch_size]) for i in range(0, len(tensors), batch_size)])
+
+    reference = None
+    for mode in modes:
+        clip.model.visual = optimize_for_cpu(fp32_visual, mode)
+        seconds, embeddings = timed(encode, repeats=2)
+        if mode == "fp32":
+            reference = embeddings
+        line = f"clip {mode:8s} {seconds / len(tensors) * 1000:8.1f} ms/image"
+        if reference is not None:
+            cosine = np.sum(embeddings * reference, axis=1)  # both l2-normalized
+            line += f"   cosine to fp32: mean {cosine.mean():.5f} min {cosine.min():.5f}"
+        print(line)
+    clip.model.visual = fp32_visual
+
+
+def bench_walls(modes, n_arts):
+    from train.train_walls_art import load_model
+    from src.walls_logic import WallArtScorer, top_k_indexes
+    from src.embedding_store import open_store
+
+    model = load_model(input_dim=1536, path=Config.walls_model_path)
+    walls = open_store(Config.wall_embeddings_path).matrix()
+    arts = np.asarray(open_store(Config.art_embeddings_path).matrix())
+    rng = np.random.default_rng(0)
+    arts = arts[rng.integers(0, len(arts), n_arts)] + rng.normal(0, 0.01, (n_arts, arts.shape[1])).astype(np.float32)
+
+    reference = None
+    for mode in modes:
+        scorer = WallArtScorer(model, inference_mode=mode)
+        scorer.set_arts(np.arange(n_arts), arts)
+        seconds, scores = timed(lambda: np.stack([scorer.score(wall)[1] for wall in walls]))
+        line = f"wall {mode:8s} {seconds / len(walls) * 1000:8.2f} ms/wall ({n_arts} arts)"
+        if mode == "fp32":
+            reference = scores
+        if reference is not None:
+            overlap = np.mean([
+                len(set(top_k_indexes(row, 30)) & set(top_k_indexes(ref_row, 30))) / 30
+                for row, ref_row in zip(scores, reference)
+            ])
+            line += f"   max |diff| {np.abs(scores - reference).max():.2e}  top-30 overlap {overlap:.3f}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--modes", nargs="+", default=list(CPU_INFERENCE_MODES), choices=CPU_INFERENCE_MODES)
+    parser.add_argument("--images", default=None, help="directory of sample images (default: random noise)")
+    parser.add_argument("--n-images", type=int, default=16)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--arts", type=int, default=20000)
+    parser.add_argument("--threads", type=int, default=Config.torch_threads)
+    parser.add_argument("--skip-clip", action="store_true")
+    args = parser.parse_args()
+
+    modes = ["fp32"] + [mode for mode in args.modes if mode != "fp32"]  # fp32 first: it is the reference
+    set_torch_threads(args.threads)
+    print(f"torch {torch.__version__}, {torch.get_num_threads()} threads")
+    if not args.skip_clip:
+        bench_clip(modes, load_images(args.images, args.n_images), args.batch_size)
+    bench_walls(modes, args.arts)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Latency and intra-list diversity of the diversification strategies in src/diversity.py,
+run on top-K pools drawn from the cached art embeddings.
+
+    python benchmarks/bench_diversity.py --pool 30 --n 10 --trials 100
+"""
+import os
+import sys
+import time
+import argparse
+import warnings
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.ann_index import l2_normalize
+from src.diversity import DIVERSIFIERS
+from src.config import Config
+from utils.get_walls_artwork_pairs import load_embeddings
+
+
+def intra_list_diversity(embeddings: np.ndarray) -> float:
+    """Mean pairwise cosine distance of the recommended items."""
+    vectors = l2_normalize(embeddings)
+    similarity = vectors @ vectors.T
+    n = len(vectors)
+    return float((n * n - similarity.sum()) / (n * (n - 1))) if n > 1 else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--art-path", default=Config.art_embeddings_path)
+    parser.add_argument("--pool", type=int, default=30)
+    parser.add_argument("--n", type=int, default=10)
+    parser.add_argument("--trials", type=int, default=100)
+    args = parser.parse_args()
+
+    _, art_embeddings = load_embeddings(art_path=args.art_path)
+    vectors = np.stack(list(art_embeddings.values())).astype(np.float32)
+
+    rng = np.random.default_rng(0)
+    pools = []
+    for _ in range(args.trials):
+        query = vectors[rng.integers(len(vectors))]
+        scores = vectors @ query + 0.05 * rng.standard_normal(len(vectors))
+        top = np.argsort(-scores)[:args.pool]
+        pools.append((scores[top], vectors[top]))
+
+    print(f"{'strategy':<16}{'median ms':>12}{'p95 ms':>10}{'diversity':>12}{'mean score':>12}")
+    baseline = [intra_list_diversity(embeddings[:args.n]) for _, embeddings in pools]
+    print(f"{'top-n (none)':<16}{'-':>12}{'-':>10}{np.mean(baseline):>12.4f}{np.mean([s[:args.n].mean() for s, _ in pools]):>12.4f}")
+    for name, strategy in DIVERSIFIERS.items():
+        times, diversities, kept_scores = [], [], []
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            for scores, embeddings in pools:
+                start = time.perf_counter()
+                picks = strategy(scores, embeddings, args.n)
+                times.append(1000 * (time.perf_counter() - start))
+                diversities.append(intra_list_diversity(embeddings[picks]))
+                kept_scores.append(scores[picks].mean())
+        print(f"{name:<16}{np.median(times):>12.3f}{np.percentile(times, 95):>10.3f}{np.mean(diversities):>12.4f}{np.mean(kept_scores):>12.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Full-catalog load time and storage size of the JSON vs float32 bytea vector columns.
+
+    python benchmarks/bench_vector_storage.py            # against DATABASE_URL (run the migration first)
+    python benchmarks/bench_vector_storage.py --offline 20000   # decode cost only, no database
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import numpy as np
+from sqlalchemy import text, select
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.config import Config
+from src.vector_codec import encode_vector, decode_vectors
+
+EMBED_DIM = 768
+
+
+def timed(fn, repeats=3):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def offline(n_rows: int):
+    rng = np.random.default_rng(0)
+    embeddings = rng.standard_normal((n_rows, EMBED_DIM)).astype(np.float32)
+    json_values = [json.dumps(row.tolist()) for row in embeddings]
+    binary_values = [encode_vector(row) for row in embeddings]
+
+    json_time, _ = timed(lambda: np.array([json.loads(value) for value in json_values], dtype=np.float32))
+    binary_time, decoded = timed(lambda: decode_vectors(binary_values, [None] * n_rows, EMBED_DIM))
+    assert np.array_equal(decoded, embeddings)
+
+    json_bytes = sum(len(value) for value in json_values)
+    binary_bytes = sum(len(value) for value in binary_values)
+    print(f"rows={n_rows}")
+    print(f"json   decode: {json_time:.3f}s  payload {json_bytes / 2**20:.1f} MiB")
+    print(f"binary decode: {binary_time:.3f}s  payload {binary_bytes / 2**20:.1f} MiB")
+
+
+async def online():
+    from db import engine, get_connection
+    from models_db import ArtworkDB
+
+    async def load_json():
+        async with get_connection() as session:
+            rows = (await session.execute(select(ArtworkDB.embeddings, ArtworkDB.colors).where(ArtworkDB.embeddings.isnot(None)))).all()
+        return np.array([row[0] for row in rows], dtype=np.float32), np.array([row[1] for row in rows], dtype=np.float32)
+
+    async def load_binary():
+        async with get_connection() as session:
+            rows = (await session.execute(select(ArtworkDB.embeddings_bin, ArtworkDB.colors_bin).where(ArtworkDB.embeddings_bin.isnot(None)))).all()
+        return (
+            decode_vectors([row[0] for row in rows], [None] * len(rows), EMBED_DIM),
+            decode_vectors([row[1] for row in rows], [None] * len(rows), Config.colors_n_bins)
+        )
+
+    for name, load in (("json", load_json), ("binary", load_binary)):
+        best = float("inf")
+        for _ in range(3):
+            start = time.perf_counter()
+            embeddings, _ = await load()
+            best = min(best, time.perf_counter() - start)
+        print(f"{name:<7} full load: {best:.3f}s for {len(embeddings)} rows")
+
+    async with engine.connect() as conn:
+        sizes = (await conn.execute(text(
+            "SELECT coalesce(sum(pg_column_size(embeddings)), 0) + coalesce(sum(pg_column_size(colors)), 0), "
+            "coalesce(sum(pg_column_size(embeddings_bin)), 0) + coalesce(sum(pg_column_size(colors_bin)), 0), "
+            "pg_total_relation_size('artworks') FROM artworks"
+        ))).one()
+    print(f"json columns:   {sizes[0] / 2**20:.1f} MiB")
+    print(f"binary columns: {sizes[1] / 2**20:.1f} MiB")
+    print(f"artworks table (total, incl. TOAST and indexes): {sizes[2] / 2**20:.1f} MiB")
+    await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--offline", type=int, default=0, help="benchmark decoding of N synthetic rows without a database")
+    args = parser.parse_args()
+    if args.offline:
+        offline(args.offline)
+    else:
+        asyncio.run(online())
+
+
+if __name__ == "__main__":
+    main()
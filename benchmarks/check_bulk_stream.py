@@ -0,0 +1,118 @@
+"""
+End-to-end check of the streamed /bulk-add-artworks request/response path over real HTTP.
+Every line of the body must come back as exactly one result line, whatever the body size.
+
+    python benchmarks/check_bulk_stream.py                               # local uvicorn, same streaming pattern
+    python benchmarks/check_bulk_stream.py --url http://localhost:8000   # a running service
+
+Against a running service the lines are invalid artworks, so they are rejected by
+validation and nothing is fetched, embedded or written to the database.
+The local mode also runs the plain StreamingResponse for comparison, which loses body
+messages to its disconnect listener.
+"""
+import os
+import sys
+import json
+import socket
+import asyncio
+import argparse
+import aiohttp
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.ingest import iter_ndjson_artworks, stream_request_body, DuplexStreamingResponse
+
+
+def local_app() -> FastAPI:
+    """The /bulk-add-artworks streaming pattern with the featurize/insert pipeline replaced by an echo."""
+    app = FastAPI()
+
+    async def echo(artworks):
+        async for line, artwork in artworks:
+            yield {"line": line, "status": "invalid" if isinstance(artwork, Exception) else "parsed"}
+
+    @app.post("/bulk-add-artworks")
+    async def bulk(request: Request):
+        body_read = asyncio.Event()
+
+        async def results():
+            async for result in echo(iter_ndjson_artworks(stream_request_body(request, body_read))):
+                yield json.dumps(result) + "\n"
+
+        return DuplexStreamingResponse(results(), body_read, media_type="application/x-ndjson")
+
+    @app.post("/bulk-plain")
+    async def bulk_plain(request: Request):
+        async def results():
+            async for result in echo(iter_ndjson_artworks(request.stream())):
+                yield json.dumps(result) + "\n"
+
+        return StreamingResponse(results(), media_type="application/x-ndjson")
+
+    return app
+
+
+async def post_lines(session, url: str, n_lines: int, chunked: bool):
+    """Returns (passed, description)."""
+    lines = [json.dumps({"check": i}).encode() + b"\n" for i in range(n_lines)]
+
+    async def body():
+        for start in range(0, len(lines), 100):
+            yield b"".join(lines[start:start + 100])
+            await asyncio.sleep(0)
+
+    try:
+        async with session.post(url, data=body() if chunked else b"".join(lines)) as response:
+            results = [json.loads(line) for line in (await response.read()).splitlines() if line.strip()]
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        return False, f"{type(e).__name__}: {e}"
+    passed = sorted(result["line"] for result in results) == list(range(1, n_lines + 1))
+    return passed, f"{len(results)} results"
+
+
+async def run_checks(base_url: str, path: str, sizes, timeout: float = 120) -> bool:
+    ok = True
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+        for n_lines in sizes:
+            for chunked in (False, True):
+                passed, description = await post_lines(session, base_url + path, n_lines, chunked)
+                ok &= passed
+                print(f"{path} {n_lines:6d} lines {'chunked' if chunked else 'buffered':8s}: {'ok' if passed else 'FAILED'} ({description})")
+    return ok
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default=None, help="base url of a running service (default: start a local server)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 5000])
+    args = parser.parse_args()
+
+    if args.url:
+        ok = await run_checks(args.url.rstrip("/"), "/bulk-add-artworks", args.sizes)
+    else:
+        port = free_port()
+        server = uvicorn.Server(uvicorn.Config(local_app(), host="127.0.0.1", port=port, log_level="critical"))
+        task = asyncio.create_task(server.serve())
+        while not server.started:
+            await asyncio.sleep(0.05)
+        try:
+            ok = await run_checks(f"http://127.0.0.1:{port}", "/bulk-add-artworks", args.sizes)
+            print("plain StreamingResponse, for comparison:")
+            await run_checks(f"http://127.0.0.1:{port}", "/bulk-plain", args.sizes, timeout=5)
+        finally:
+            server.should_exit = True
+            await task
+    print("PASS" if ok else "FAIL")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,88 @@
+"""
+Load test for the /user-interaction write path: grows user_interactions to millions of
+rows and measures INSERT ... ON CONFLICT DO NOTHING latency (and the per-user history
+read) at every checkpoint, to confirm it stays flat as the table grows.
+Synthetic rows use user ids prefixed with 'loadtest-' and are deleted at the end
+unless --keep is given. Run against a staging database.
+
+    python benchmarks/load_interactions.py --checkpoints 10000 100000 1000000 3000000
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import numpy as np
+from sqlalchemy import text, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from db import engine, get_connection, connect_db
+from models_db import UserInteractionDB
+
+PREFIX = "loadtest-"
+
+
+async def grow_to(n_rows: int, n_users: int):
+    """Bulk-generate synthetic interactions server-side until the synthetic row count reaches n_rows."""
+    async with engine.begin() as conn:
+        current = (await conn.execute(text("SELECT count(*) FROM user_interactions WHERE user_id LIKE :p"), {"p": PREFIX + "%"})).scalar_one()
+        missing = n_rows - current
+        if missing <= 0:
+            return
+        await conn.execute(text(
+            "INSERT INTO user_interactions (user_id, artwork_id, action) "
+            "SELECT :p || (g % :users), (g / :users)::text, CASE WHEN g % 3 = 0 THEN 'dislike' ELSE 'like' END "
+            "FROM generate_series(:start, :stop) AS g ON CONFLICT DO NOTHING"
+        ), {"p": PREFIX, "users": n_users, "start": current, "stop": current + missing - 1})
+        await conn.execute(text("ANALYZE user_interactions"))
+
+
+async def measure(samples: int, n_users: int, n_artworks: int):
+    write, read = [], []
+    for _ in range(samples):
+        user_id = f"{PREFIX}{random.randrange(n_users)}"
+        artwork_id = str(random.randrange(n_artworks * 10))
+        start = time.perf_counter()
+        async with get_connection() as session:
+            await session.execute(
+                pg_insert(UserInteractionDB)
+                .values(user_id=user_id, artwork_id=artwork_id, action=random.choice(["like", "dislike"]))
+                .on_conflict_do_nothing(index_elements=["user_id", "artwork_id", "action"])
+            )
+            await session.commit()
+        write.append(1000 * (time.perf_counter() - start))
+
+        start = time.perf_counter()
+        async with get_connection() as session:
+            await session.execute(select(UserInteractionDB.artwork_id, UserInteractionDB.action).where(UserInteractionDB.user_id == user_id))
+        read.append(1000 * (time.perf_counter() - start))
+    return np.array(write), np.array(read)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--checkpoints", type=int, nargs="+", default=[10_000, 100_000, 1_000_000, 3_000_000])
+    parser.add_argument("--users", type=int, default=50_000)
+    parser.add_argument("--artworks", type=int, default=10_000)
+    parser.add_argument("--samples", type=int, default=300)
+    parser.add_argument("--keep", action="store_true")
+    args = parser.parse_args()
+
+    await connect_db()
+    print(f"{'rows':>10}{'write p50':>12}{'write p99':>12}{'history p50':>14}{'history p99':>14}  (ms)")
+    try:
+        for n_rows in args.checkpoints:
+            await grow_to(n_rows, args.users)
+            write, read = await measure(args.samples, args.users, args.artworks)
+            print(f"{n_rows:>10}{np.percentile(write, 50):>12.2f}{np.percentile(write, 99):>12.2f}{np.percentile(read, 50):>14.2f}{np.percentile(read, 99):>14.2f}")
+    finally:
+        if not args.keep:
+            async with engine.begin() as conn:
+                await conn.execute(text("DELETE FROM user_interactions WHERE user_id LIKE :p"), {"p": PREFIX + "%"})
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
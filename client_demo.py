@@ -62,6 +62,40 @@ def user_interaction(user_id: str, artwork_id: str, action: str):
             print(f"Response detail: {response.text}")
         return []
 
+def build_artwork_data(filename: str) -> dict:
+    """
+    Constructs consistent (non-'garbage') dummy Artwork data for an image file.
+    """
+    # Generate a unique ID (can be based on filename or a UUID)
+    artwork_id = os.path.splitext(filename)[0] + "-" + str(uuid.uuid4())[:4]
+    artwork_name = os.path.splitext(filename)[0].replace('_', ' ').title()
+    
+    # Consistent (non-'garbage') dummy data
+    artist_name = f"Artist_{random.choice(['A', 'B', 'C'])}"
+    description = f"A beautiful piece named '{artwork_name}' by {artist_name}, digitally imported."
+    category = random.choice(["Abstract", "Portrait", "Landscape", "Still Life"])
+    style = random.choice(["Modern", "Impressionist", "Surreal", "Realistic"])
+    subject = random.choice(["Nature", "People", "Objects", "Emotions"])
+    
+    artwork_data = {
+        "artwork_id": artwork_id,
+        "artist_id": f"artst-{hash(artist_name) % 1000}", # Simple hash for artist ID
+        "artist_name": artist_name,
+        "artwork_name": artwork_name,
+        # Assuming /images endpoint on server serves images from data/data
+        "images": [f"{IMAGE_FOLDER_CLIENT}/{filename}"], 
+        "description": description,
+        "category": category,
+        "properties": {"source": "local_folder_import", "client_generated": True},
+        "media": "Digital File",
+        "medium": "Mixed Media",
+        "size": "Digital",
+        "price": round(random.uniform(100.0, 5000.0), 2), # Random price
+        "styles": [style],
+        "subject": subject
+    }
+    return artwork_data
+
 # --- New client-side function to populate artworks ---
 def populate_artworks_from_folder(limit: int = 15):
     """
@@ -86,37 +120,10 @@ def populate_artworks_from_folder(limit: int = 15):
             if count >= limit:
                 break
 
-            # Generate a unique ID (can be based on filename or a UUID)
-            artwork_id = os.path.splitext(filename)[0] + "-" + str(uuid.uuid4())[:4]
-            artwork_name = os.path.splitext(filename)[0].replace('_', ' ').title()
-            
-            # Consistent (non-'garbage') dummy data
-            artist_name = f"Artist_{random.choice(['A', 'B', 'C'])}"
-            description = f"A beautiful piece named '{artwork_name}' by {artist_name}, digitally imported."
-            category = random.choice(["Abstract", "Portrait", "Landscape", "Still Life"])
-            style = random.choice(["Modern", "Impressionist", "Surreal", "Realistic"])
-            subject = random.choice(["Nature", "People", "Objects", "Emotions"])
-            
-            artwork_data = {
-                "artwork_id": artwork_id,
-                "artist_id": f"artst-{hash(artist_name) % 1000}", # Simple hash for artist ID
-                "artist_name": artist_name,
-                "artwork_name": artwork_name,
-                # Assuming /images endpoint on server serves images from data/data
-                "images": [f"{IMAGE_FOLDER_CLIENT}/{filename}"], 
-                "description": description,
-                "category": category,
-                "properties": {"source": "local_folder_import", "client_generated": True},
-                "media": "Digital File",
-                "medium": "Mixed Media",
-                "size": "Digital",
-                "price": round(random.uniform(100.0, 5000.0), 2), # Random price
-                "styles": [style],
-                "subject": subject
-            }
+            artwork_data = build_artwork_data(filename)
 
             if add_artwork(artwork_data): # Use the existing add_artwork helper to send
-                loaded_ids.append(artwork_id)
+                loaded_ids.append(artwork_data["artwork_id"])
                 count += 1
             
             time.sleep(0.1) # Small delay to not overwhelm the server
@@ -129,6 +136,44 @@ def populate_artworks_from_folder(limit: int = 15):
     print(f"\nSuccessfully populated {len(loaded_ids)} artworks via individual API calls.")
     return loaded_ids
 
+def bulk_add_artworks(artworks: list[dict]):
+    """
+    Calls the /bulk-add-artworks endpoint with one NDJSON line per artwork
+    and prints the per-artwork results as they stream back.
+    """
+    print(f"\n--- Bulk adding {len(artworks)} artworks ---")
+    url = f"{BASE_URL}/bulk-add-artworks"
+    body = (json.dumps(artwork_data) + "\n" for artwork_data in artworks)
+    added_ids = []
+    response = None
+    try:
+        response = requests.post(url, data=body, headers={"Content-Type": "application/x-ndjson"}, stream=True)
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if not line:
+                continue
+            result = json.loads(line)
+            print(json.dumps(result))
+            if result.get("status") == "added":
+                added_ids.append(result["artwork_id"])
+        return added_ids
+    except requests.exceptions.RequestException as e:
+        print(f"Error during bulk add: {e}")
+        if response is not None:
+            print(f"Response status: {response.status_code}")
+            print(f"Response detail: {response.text}")
+        return added_ids
+
+def populate_artworks_bulk(limit: int = 15):
+    """
+    Same dummy artworks as populate_artworks_from_folder, sent in a single
+    /bulk-add-artworks request instead of one request per artwork.
+    """
+    artworks = [build_artwork_data(f"{idx}.jpg") for idx in range(1, limit + 1)]
+    loaded_ids = bulk_add_artworks(artworks)
+    print(f"\nSuccessfully populated {len(loaded_ids)} artworks via one bulk request.")
+    return loaded_ids
+
 def wall_interaction(user_id: str, wall_index: int):
     """
     Calls the /user-interaction endpoint with action='wall'
@@ -197,6 +242,26 @@ def delete_by_artist(artist_id: str):
             print(f"Response detail: {response.text}")
         return None
 
+def delete_artworks(artwork_ids: list):
+    """
+    Calls the /delete-artworks endpoint with a batch of artwork ids.
+    """
+    print(f"\n--- Deleting {len(artwork_ids)} artworks ---")
+    url = f"{BASE_URL}/delete-artworks"
+    try:
+        response = requests.post(url, json={"artwork_ids": artwork_ids})
+        response.raise_for_status()
+        data = response.json()
+        print("Batch delete response:")
+        print(json.dumps(data, indent=2))
+        return data
+    except requests.exceptions.RequestException as e:
+        print(f"Error deleting artworks: {e}")
+        if response is not None:
+            print(f"Response status: {response.status_code}")
+            print(f"Response detail: {response.text}")
+        return None
+
 # --- Demo Client Logic ---
 if __name__ == "__main__":
     print("Starting FastAPI Demo Client...")
@@ -1,27 +1,108 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from collections import deque
+from uuid import uuid4
 import os
-import asyncio
+import time
 from src.config import Config
+from src.resilience import retry
 
 DATABASE_URL = os.getenv("DATABASE_URL", Config.db_url)
 
-engine = create_async_engine(DATABASE_URL, echo=True, connect_args={"statement_cache_size": 0}, execution_options={"postgresql_prepare_threshold": None},)
+
+def uses_transaction_pooler(url: str) -> bool:
+    """PgBouncer / Supavisor in transaction mode can't keep prepared statements across transactions."""
+    if Config.db_transaction_pooler is not None:
+        return Config.db_transaction_pooler
+    return ":6543/" in url or ".pooler." in url
+
+
+class PoolMetrics:
+    """Checkout counters and wait times of the engine's pool, for sizing db_pool_size against the worker count."""
+
+    def __init__(self, window: int = 1000):
+        self.waits = deque(maxlen=window)
+        self.checkouts = 0
+        self.timeouts = 0
+
+    def stats(self, pool) -> dict:
+        waits = sorted(self.waits)
+        return dict(
+            pool_size=pool.size(),
+            checked_out=pool.checkedout(),
+            overflow=max(pool.overflow(), 0),
+            idle=pool.checkedin(),
+            checkouts=self.checkouts,
+            timeouts=self.timeouts,
+            wait_ms_mean=round(sum(waits) / len(waits) * 1000, 3) if waits else 0.0,
+            wait_ms_p99=round(waits[min(len(waits) - 1, int(len(waits) * 0.99))] * 1000, 3) if waits else 0.0,
+            wait_ms_max=round(waits[-1] * 1000, 3) if waits else 0.0
+        )
+
+
+pool_metrics = PoolMetrics()
+
+
+class MeteredPool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each checkout waited for a free connection."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except Exception:
+            pool_metrics.timeouts += 1
+            raise
+        finally:
+            pool_metrics.waits.append(time.perf_counter() - start)
+            pool_metrics.checkouts += 1
+
+
+def _connect_args(url: str) -> dict:
+    if uses_transaction_pooler(url):
+        # statements can't outlive a transaction on the pooler: no cache, unique names
+        return dict(
+            statement_cache_size=0,
+            prepared_statement_cache_size=0,
+            prepared_statement_name_func=lambda: f"__asyncpg_{uuid4()}__"
+        )
+    args = dict(statement_cache_size=Config.db_statement_cache_size)
+    if Config.db_statement_timeout_ms:
+        args["server_settings"] = {"statement_timeout": str(Config.db_statement_timeout_ms)}
+    return args
+
+
+def _create_engine(url: str):
+    return create_async_engine(
+        url,
+        echo=Config.db_echo,
+        poolclass=MeteredPool,
+        pool_size=Config.db_pool_size,
+        max_overflow=Config.db_max_overflow,
+        pool_timeout=Config.db_pool_timeout_seconds,
+        pool_recycle=Config.db_pool_recycle_seconds,
+        pool_pre_ping=Config.db_pool_pre_ping,
+        connect_args=_connect_args(url)
+    )
+
+
+engine = _create_engine(DATABASE_URL)
 SessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 Base = declarative_base()
 
 async def connect_db():
-    while True:
-        try:
-            async with engine.begin() as conn:
-                await conn.run_sync(Base.metadata.create_all)
-                break
-        except Exception as e:
-            print(f"DB connection failed: {e}, retrying in 10s...")
-            await asyncio.sleep(10)
+    async def create_tables():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    await retry(create_tables, name="DB connection", attempts=Config.db_connect_attempts, max_delay=30.0)
 
 async def close_db():
     await engine.dispose()
 
 def get_connection():
     return SessionLocal()
+
+def get_pool_stats() -> dict:
+    return pool_metrics.stats(engine.pool)
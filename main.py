@@ -1,124 +1,148 @@
+import json
+import asyncio
 import uvicorn
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from typing import List
-from models import Artwork, UserInteraction, ArtworkResponse
-import asyncio
+from models import Artwork, UserInteraction, ArtworkResponse, ArtworkIds
 from src.logic import Logic
-from db import connect_db, close_db, get_connection
-from sqlalchemy import text, select
-from models_db import UserInteractionDB, ArtworkDB
+from src.ingest import iter_ndjson_artworks, stream_request_body, DuplexStreamingResponse
+from src.executors import EventLoopLagMonitor, shutdown_executors, run_inference
+from src.registry import model_registry
+from src.interaction_buffer import InteractionBuffer
+from src.resilience import CircuitOpenError, db_breaker, db_retry
+from src.config import Config
+from db import connect_db, close_db, get_connection, get_pool_stats
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from models_db import UserInteractionDB
 
 app = FastAPI()
 logic = None
+ready = False
+loop_lag_monitor = EventLoopLagMonitor()
+interaction_buffer = None
 
 @app.on_event("startup")
 async def startup():
+    global logic, ready, interaction_buffer
+    loop_lag_monitor.start()
     await connect_db()
+    await run_inference(model_registry.load)
+    if Config.warm_up_models:
+        await run_inference(model_registry.warm_up)
+    logic = Logic(registry=model_registry)
+    await logic.load_catalog()
+    if Config.async_interactions:
+        interaction_buffer = InteractionBuffer(get_connection, logic.profiles)
+        await interaction_buffer.start()
+    ready = True
 
 @app.on_event("shutdown")
 async def shutdown():
+    await loop_lag_monitor.stop()
+    if interaction_buffer is not None:
+        await interaction_buffer.close()
+    if logic is not None:
+        await logic.close()
     await close_db()
+    shutdown_executors()
+
+@app.get("/metrics/event-loop")
+async def event_loop_metrics():
+    return loop_lag_monitor.stats()
+
+@app.get("/metrics/db-pool")
+async def db_pool_metrics():
+    return {**get_pool_stats(), "breaker": db_breaker.stats()}
+
+@app.exception_handler(CircuitOpenError)
+async def circuit_open_handler(request: Request, exc: CircuitOpenError):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(int(exc.retry_after) + 1)}
+    )
 
 def get_logic() -> Logic:
     global logic
     if logic is None:
-        logic = Logic()  # expensive init
+        logic = Logic(registry=model_registry)  # models are normally loaded by startup()
     return logic
 
+@app.get("/ready")
+async def readiness():
+    if not ready:
+        return JSONResponse(status_code=503, content={"status": "starting", "models_loaded": model_registry.loaded, "models_warm": model_registry.warm})
+    return {"status": "ready", "models_warm": model_registry.warm}
+
 @app.post("/add-artwork", status_code=200)
 async def add_artwork(artwork: Artwork):
     logic = get_logic()
     result = await logic.add_artwork(artwork)
     return 200 if result else 400
 
+@app.post("/bulk-add-artworks")
+async def bulk_add_artworks(request: Request):
+    """Body: one Artwork JSON object per line (JSONL / NDJSON). Streams back one result line per artwork."""
+    logic = get_logic()
+    body_read = asyncio.Event()
+
+    async def results():
+        async for result in logic.bulk_add_artworks(iter_ndjson_artworks(stream_request_body(request, body_read))):
+            yield json.dumps(result) + "\n"
+
+    return DuplexStreamingResponse(results(), body_read, media_type="application/x-ndjson")
+
 async def record_artwork_feedback(user_id: str, artwork_id: str, action: str) -> List[str]:
-    while True:
-        try:
-            async with get_connection() as session:
-                # Check if interaction already exists
-                stmt = select(UserInteractionDB).where(
-                    UserInteractionDB.user_id == user_id,
-                    UserInteractionDB.artwork_id == artwork_id,
-                    UserInteractionDB.action == action
-                )
-                result = await session.execute(stmt)
-                existing = result.scalar_one_or_none()
-
-                # Save new interaction if not exists
-                if not existing:
-                    new_record = UserInteractionDB(
-                        user_id=user_id,
-                        artwork_id=artwork_id,
-                        action=action
-                    )
-                    session.add(new_record)
-                    await session.commit()
-
-                # Fetch all interactions for this user
-                stmt_all = select(UserInteractionDB).where(
-                    UserInteractionDB.user_id == user_id
-                )
-                result_all = await session.execute(stmt_all)
-                interactions = result_all.scalars().all()
-
-                # Prepare input for prediction
-                artwork_ids = [i.artwork_id for i in interactions]
-                targets = [1 if i.action == "like" else 0 for i in interactions]
-
-                logic = get_logic()
-                sorted_ids = await logic.predict_artworks(
-                    artwork_id=artwork_ids,
-                    target=targets
-                )
-
-            return [id for id in sorted_ids]
-        except Exception as e:
-            print(f"DB connection failed: {e}, retrying in 10s...")
-            await asyncio.sleep(10)
+    if interaction_buffer is not None:
+        # write-behind: the DB insert happens in the next batched flush
+        interaction_buffer.add(user_id, artwork_id, action)
+        return await get_logic().recommend_for_user(user_id, artwork_id, action)
+
+    async def save_interaction():
+        async with get_connection() as session:
+            # Save the interaction unless it already exists, in one round trip
+            stmt = pg_insert(UserInteractionDB).values(
+                user_id=user_id,
+                artwork_id=artwork_id,
+                action=action
+            ).on_conflict_do_nothing(index_elements=["user_id", "artwork_id", "action"])
+            await session.execute(stmt)
+            await session.commit()
+
+    await db_retry(save_interaction, name="Saving interaction")
+
+    # Update the user's running profile and recommend from it
+    logic = get_logic()
+    sorted_ids = await logic.recommend_for_user(user_id, artwork_id, action)
+
+    return [id for id in sorted_ids]
 
 @app.delete("/delete-artwork/{artwork_id}", status_code=200)
 async def delete_artwork(artwork_id: str):
-    while True:
-        try:
-            async with get_connection() as session:
-                stmt = select(ArtworkDB).where(ArtworkDB.artwork_id == artwork_id)
-                result = await session.execute(stmt)
-                artwork = result.scalar_one_or_none()
-
-                if not artwork:
-                    return {"status": "not found"}
-
-                await session.delete(artwork)
-                await session.commit()
-                return {"status": "deleted", "artwork_id": artwork_id}
-        except Exception as e:
-            print(f"DB connection failed: {e}, retrying in 10s...")
-            await asyncio.sleep(10)
+    if not await get_logic().delete_artworks([artwork_id]):
+        return {"status": "not found"}
+    return {"status": "deleted", "artwork_id": artwork_id}
     
 @app.delete("/delete-by-artist/{artist_id}", status_code=200)
 async def delete_by_artist(artist_id: str):
-    while True:
-        try:
-            async with get_connection() as session:
-                stmt = select(ArtworkDB).where(ArtworkDB.artist_id == artist_id)
-                result = await session.execute(stmt)
-                artworks = result.scalars().all()
-
-                if not artworks:
-                    return {"status": "not found"}
-
-                for artwork in artworks:
-                    await session.delete(artwork)
-
-                await session.commit()
-                return {
-                    "status": "deleted",
-                    "artist_id": artist_id,
-                    "count": len(artworks)
-                }
-        except Exception as e:
-            print(f"DB connection failed: {e}, retrying in 10s...")
-            await asyncio.sleep(10)
+    deleted_ids = await get_logic().delete_by_artist(artist_id)
+    if not deleted_ids:
+        return {"status": "not found"}
+    return {
+        "status": "deleted",
+        "artist_id": artist_id,
+        "count": len(deleted_ids)
+    }
+
+@app.post("/delete-artworks", status_code=200)
+async def delete_artworks(request: ArtworkIds):
+    deleted_ids = await get_logic().delete_artworks(request.artwork_ids)
+    return {
+        "status": "deleted" if deleted_ids else "not found",
+        "artwork_ids": deleted_ids,
+        "count": len(deleted_ids)
+    }
 
 
 @app.post("/user-interaction", response_model=List[str])
@@ -23,5 +23,8 @@ class UserInteraction(BaseModel):
     action: str
     timestamp: datetime
 
+class ArtworkIds(BaseModel):
+    artwork_ids: List[str]
+
 class ArtworkResponse(BaseModel):
     artwork_id: str
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, String, Integer, JSON, Text, Float
+from sqlalchemy import Column, String, Integer, JSON, Text, Float, LargeBinary, Index
+from sqlalchemy.dialects.postgresql import ARRAY
 from db import Base
 
 class ArtworkDB(Base):
@@ -14,17 +15,40 @@ class ArtworkDB(Base):
     properties = Column(JSON)
     embeddings = Column(JSON)
     colors = Column(JSON)
+    embeddings_bin = Column(LargeBinary)  # float32 bytes, see src/vector_codec.py
+    colors_bin = Column(LargeBinary)
     abstract = Column(Float)
     noisy = Column(Float)
     paint = Column(Float)
 
 class UserInteractionDB(Base):
     __tablename__ = "user_interactions"
+    # The unique index makes the feedback write a single INSERT ... ON CONFLICT DO NOTHING,
+    # and with user_id leading it also serves per-user history reads as an index-only scan.
+    __table_args__ = (
+        Index("uq_user_interactions_user_artwork_action", "user_id", "artwork_id", "action", unique=True),
+    )
     id = Column(Integer, primary_key=True)
     user_id = Column(String, nullable=False)
     artwork_id = Column(String, nullable=False)
     action = Column(String, nullable=False)
 
+class UserProfileDB(Base):
+    """Running liked / disliked sums per user (float64 bytes), maintained by src/profiles.py."""
+    __tablename__ = "user_profiles"
+    user_id = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)  # bumped by every write; writers check it (optimistic locking)
+    liked_count = Column(Integer, nullable=False, default=0)
+    disliked_count = Column(Integer, nullable=False, default=0)
+    liked_ids = Column(ARRAY(Text), nullable=False, default=list)  # appended to with array_cat, never rewritten
+    disliked_ids = Column(ARRAY(Text), nullable=False, default=list)
+    liked_embeddings_sum = Column(LargeBinary)
+    disliked_embeddings_sum = Column(LargeBinary)
+    liked_colors_sum = Column(LargeBinary)
+    disliked_colors_sum = Column(LargeBinary)
+    liked_scalars_sum = Column(LargeBinary)
+    disliked_scalars_sum = Column(LargeBinary)
+
 class WallSelectionDB(Base):
     __tablename__ = "wall_selections"
     wall_index = Column(Text, primary_key=True)
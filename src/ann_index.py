@@ -0,0 +1,182 @@
+import threading
+
+import numpy as np
+
+from src.config import Config
+from src.executors import inference_executor
+
+
+def l2_normalize(x: np.ndarray) -> np.ndarray:
+    x = np.asarray(x, dtype=np.float32)
+    norms = np.linalg.norm(x, axis=-1, keepdims=True)
+    return x / np.where(norms == 0, 1, norms)
+
+
+def spherical_kmeans(x: np.ndarray, n_clusters: int, n_iter: int = 10, seed: int = 42) -> np.ndarray:
+    """Lloyd iterations on unit vectors (cosine distance). Returns (n_clusters, dim) unit centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = x[rng.choice(len(x), n_clusters, replace=False)].copy()
+    for _ in range(n_iter):
+        assign = np.argmax(x @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, x)
+        empty = np.bincount(assign, minlength=n_clusters) == 0
+        sums[empty] = x[rng.choice(len(x), int(empty.sum()), replace=False)]
+        centroids = l2_normalize(sums)
+    return centroids
+
+
+def nearest_centroid(vectors, centroids) -> np.ndarray:
+    return np.argmax(vectors @ centroids.T, axis=1)
+
+
+class IVFIndex:
+    """
+    In-process inverted-file index over the normalized catalog embeddings.
+    Vectors are bucketed by their nearest k-means centroid and each bucket is stored
+    as its own contiguous matrix, so a query scores the n_probe buckets whose centroids
+    are closest to it without gathering rows.
+    Registered as a Catalog listener so adds/deletes are applied incrementally.
+    Once the catalog doubles in size the centroids are re-trained on the inference
+    executor; adds/deletes keep being applied to the old buckets meanwhile and are
+    replayed onto the new ones when they are swapped in.
+    """
+
+    def __init__(self, n_lists=Config.ann_n_lists, n_probe=Config.ann_n_probe, probe_fraction=Config.ann_probe_fraction,
+                 min_size=Config.ann_min_catalog_size):
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.probe_fraction = probe_fraction
+        self.min_size = min_size
+        self.trained_size = 0
+        # (centroids or None, ids per bucket, vectors per bucket); replaced as a whole, never mutated
+        self._state = (None, [], [])
+        self._generation = 0  # bumped by every reset, invalidates a rebuild in flight
+        self._rebuilding = False
+        self._changes = []  # (method, args) applied while a rebuild is running
+        # catalog changes arrive on executor threads and a rebuild finishes on another one
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self._state[0] is not None
+
+    @property
+    def centroids(self):
+        return self._state[0]
+
+    def _probes(self, n_lists: int) -> int:
+        return self.n_probe or max(1, int(np.ceil(self.probe_fraction * n_lists)))
+
+    @property
+    def lists_probed(self) -> int:
+        return self._probes(len(self.centroids)) if self.ready else 0
+
+    def __len__(self):
+        return sum(len(ids) for ids in self._state[1])
+
+    def train(self, ids, embeddings) -> tuple:
+        """Build a new state without touching the index: pure numpy, safe to run off the event loop."""
+        ids = np.asarray(ids, dtype=object)
+        vectors = l2_normalize(embeddings).reshape(len(ids), -1)
+        if len(ids) < self.min_size:
+            return None, [ids], [vectors]
+        n_lists = self.n_lists or int(np.sqrt(len(ids)))
+        centroids = spherical_kmeans(vectors, n_lists)
+        assign = nearest_centroid(vectors, centroids)
+        order = np.argsort(assign, kind="stable")
+        bounds = np.searchsorted(assign[order], np.arange(n_lists + 1))
+        rows = [order[bounds[i]:bounds[i + 1]] for i in range(n_lists)]
+        return centroids, [ids[r] for r in rows], [vectors[r] for r in rows]
+
+    def _swap_in(self, state, size):
+        self._state = state
+        self.trained_size = size if state[0] is not None else 0
+        if self.ready:
+            print(f"ANN index built: {size} vectors in {len(state[0])} lists")
+
+    def build(self, ids, embeddings):
+        state = self.train(ids, embeddings)
+        with self._lock:
+            self._generation += 1
+            self._changes = []
+            self._swap_in(state, len(ids))
+
+    def search(self, query, k) -> np.ndarray:
+        """Approximate top-k ids by inner product with query (cosine for a unit query)."""
+        centroids, list_ids, list_vectors = self._state
+        query = np.asarray(query, dtype=np.float32).reshape(-1)
+        lists = range(len(list_ids)) if centroids is None else np.argsort(-(centroids @ query))[:self._probes(len(centroids))]
+        lists = [i for i in lists if len(list_ids[i])]
+        if not lists:
+            return np.empty(0, dtype=object)
+        ids = np.concatenate([list_ids[i] for i in lists])
+        scores = np.concatenate([list_vectors[i] @ query for i in lists])
+        k = min(k, len(ids))
+        top = np.argpartition(-scores, k - 1)[:k]
+        return ids[top[np.argsort(-scores[top])]]
+
+    def _remove(self, artwork_ids):
+        centroids, list_ids, list_vectors = self._state
+        new_ids, new_vectors = list(list_ids), list(list_vectors)
+        for i, ids in enumerate(list_ids):
+            keep = ~np.isin(ids, artwork_ids)
+            if not keep.all():
+                new_ids[i], new_vectors[i] = ids[keep], list_vectors[i][keep]
+        self._state = (centroids, new_ids, new_vectors)
+
+    def _add(self, ids, vectors):
+        self._remove(ids)  # re-added ids replace their old vector
+        centroids, list_ids, list_vectors = self._state
+        if not list_ids:
+            self._state = (centroids, [ids], [vectors])
+            return
+        assign = np.zeros(len(ids), dtype=np.int64) if centroids is None else nearest_centroid(vectors, centroids)
+        new_ids, new_vectors = list(list_ids), list(list_vectors)
+        for i in np.unique(assign):
+            rows = assign == i
+            new_ids[i] = np.concatenate([list_ids[i], ids[rows]])
+            new_vectors[i] = np.vstack([list_vectors[i].reshape(-1, vectors.shape[1]), vectors[rows]])
+        self._state = (centroids, new_ids, new_vectors)
+
+    def _apply(self, method, *args):
+        with self._lock:
+            method(*args)
+            if self._rebuilding:
+                self._changes.append((method.__name__, args))
+
+    def _rebuild(self, snapshot, generation):
+        """Runs on the inference executor; the change replay and swap are atomic w.r.t. _apply."""
+        try:
+            state = self.train(snapshot.ids, snapshot.embeddings)
+        except Exception as e:
+            print(f"ANN index rebuild failed: {e}")
+            state = None
+        with self._lock:
+            self._rebuilding = False
+            changes, self._changes = self._changes, []
+            if state is None or generation != self._generation:
+                return  # failed, or the catalog was reloaded while training
+            self._swap_in(state, len(snapshot))
+            for name, args in changes:
+                getattr(self, name)(*args)
+
+    def _schedule_rebuild(self, snapshot):
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+            generation = self._generation
+        inference_executor.submit(self._rebuild, snapshot, generation)
+
+    def on_catalog_reset(self, snapshot):
+        self.build(snapshot.ids, snapshot.embeddings)
+
+    def on_catalog_added(self, snapshot, artwork_ids):
+        added = snapshot.rows_of(artwork_ids)
+        self._apply(self._add, snapshot.ids[added], l2_normalize(snapshot.embeddings[added]))
+        if len(snapshot) >= max(2 * self.trained_size, self.min_size):
+            self._schedule_rebuild(snapshot)
+
+    def on_catalog_removed(self, snapshot, artwork_ids):
+        self._apply(self._remove, artwork_ids)
@@ -0,0 +1,72 @@
+import asyncio
+import time
+
+from src.config import Config
+from src.executors import run_inference
+
+
+class MicroBatcher:
+    """
+    Groups items submitted by concurrent requests into shared calls of fn.
+    A batch is dispatched as soon as it holds max_batch_size items or max_wait_ms
+    has passed since its first item arrived. fn(list_of_items) -> sequence of results
+    is synchronous and runs on the inference executor, off the event loop.
+    """
+
+    def __init__(self, fn, max_batch_size: int = Config.clip_max_batch_size, max_wait_ms: float = Config.clip_max_wait_ms):
+        self.fn = fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = None
+        self._worker = None
+
+    def _ensure_worker(self):
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+
+    async def submit(self, item):
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    async def submit_many(self, items: list) -> list:
+        return list(await asyncio.gather(*(self.submit(item) for item in items)))
+
+    async def _next_batch(self) -> list:
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            items = [item for item, _ in batch]
+            try:
+                results = await run_inference(self.fn, items)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    async def close(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
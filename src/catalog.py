@@ -0,0 +1,166 @@
+import asyncio
+
+import numpy as np
+
+from src.config import Config
+from src.executors import run_inference
+
+
+class CatalogSnapshot:
+    """
+    Immutable, column-oriented view of the artworks table.
+    ids[i] is the artwork id of row i in every matrix / column.
+    """
+
+    def __init__(self, ids, embeddings, colors, abstract, noisy, paint):
+        self.ids = ids
+        self.embeddings = embeddings
+        self.colors = colors
+        self.abstract = abstract
+        self.noisy = noisy
+        self.paint = paint
+        self.index = {artwork_id: row for row, artwork_id in enumerate(ids)}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def rows_of(self, artwork_ids) -> np.ndarray:
+        rows = [self.index[artwork_id] for artwork_id in artwork_ids if artwork_id in self.index]
+        return np.array(rows, dtype=np.int64)
+
+    def mask_not(self, artwork_ids) -> np.ndarray:
+        mask = np.ones(len(self.ids), dtype=bool)
+        mask[self.rows_of(artwork_ids)] = False
+        return mask
+
+    def select(self, rows) -> dict:
+        abstract = self.abstract[rows]
+        noisy = self.noisy[rows]
+        paint = self.paint[rows]
+        return dict(
+            ids=self.ids[rows],
+            embeddings=self.embeddings[rows],
+            colors=self.colors[rows],
+            classifiers=np.stack([abstract, noisy, paint], axis=1),
+            abstract=abstract,
+            noisy=noisy,
+            paint=paint
+        )
+
+    def take(self, artwork_ids) -> dict:
+        return self.select(self.rows_of(artwork_ids))
+
+    def exclude(self, artwork_ids) -> dict:
+        return self.select(self.mask_not(artwork_ids))
+
+
+class Catalog:
+    """
+    Resident float32 copy of the scoring columns of every artwork, loaded once at
+    startup and kept in sync by add / remove. Each change builds a new snapshot,
+    so a reader holding a snapshot is never affected by concurrent writes.
+
+    Derived caches register as listeners and are notified after every change with
+    the new snapshot and the affected ids:
+        on_catalog_reset(snapshot)
+        on_catalog_added(snapshot, artwork_ids)
+        on_catalog_removed(snapshot, artwork_ids)
+
+    A change copies the N x 768 columns and every listener rebuilds its own N-sized
+    state, so the service applies changes through update(), which runs them on the
+    inference executor one at a time; listeners are therefore called off the event loop.
+    """
+
+    def __init__(self, embed_dim: int = 768, n_colors: int = Config.colors_n_bins):
+        self.embed_dim = embed_dim
+        self.n_colors = n_colors
+        self.loaded = False
+        self._listeners = []
+        self._update_lock = asyncio.Lock()
+        self._snapshot = self._build([], [], [], [], [], [])
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+        if self.loaded:
+            listener.on_catalog_reset(self._snapshot)
+
+    def __len__(self):
+        return len(self._snapshot)
+
+    def __contains__(self, artwork_id):
+        return artwork_id in self._snapshot.index
+
+    def snapshot(self) -> CatalogSnapshot:
+        return self._snapshot
+
+    async def update(self, method, *args):
+        """Run a change (load_columns / add / add_many / remove) on the inference executor, one at a time."""
+        async with self._update_lock:
+            return await run_inference(method, *args)
+
+    def _build(self, ids, embeddings, colors, abstract, noisy, paint) -> CatalogSnapshot:
+        return CatalogSnapshot(
+            ids=np.array(ids, dtype=object),
+            embeddings=np.asarray(embeddings, dtype=np.float32).reshape(-1, self.embed_dim),
+            colors=np.asarray(colors, dtype=np.float32).reshape(-1, self.n_colors),
+            abstract=np.asarray(abstract, dtype=np.float32),
+            noisy=np.asarray(noisy, dtype=np.float32),
+            paint=np.asarray(paint, dtype=np.float32)
+        )
+
+    def load_columns(self, ids, embeddings, colors, abstract, noisy, paint):
+        """Column-wise load; rows whose embeddings or colors contain NaN (missing vectors) are skipped."""
+        snapshot = self._build(ids, embeddings, colors, abstract, noisy, paint)
+        valid = ~(np.isnan(snapshot.embeddings).any(axis=1) | np.isnan(snapshot.colors).any(axis=1))
+        if not valid.all():
+            snapshot = CatalogSnapshot(
+                ids=snapshot.ids[valid],
+                embeddings=snapshot.embeddings[valid],
+                colors=snapshot.colors[valid],
+                abstract=snapshot.abstract[valid],
+                noisy=snapshot.noisy[valid],
+                paint=snapshot.paint[valid]
+            )
+        self._snapshot = snapshot
+        self.loaded = True
+        print(f"Catalog loaded with {len(self._snapshot)} artworks")
+        for listener in self._listeners:
+            listener.on_catalog_reset(self._snapshot)
+
+    def add(self, artwork_id, embeddings, colors, abstract, noisy, paint):
+        self.add_many([(artwork_id, embeddings, colors, abstract, noisy, paint)])
+
+    def add_many(self, rows):
+        """rows: list of (artwork_id, embeddings, colors, abstract, noisy, paint); existing ids are replaced."""
+        if not rows:
+            return
+        added = self._build(*(list(column) for column in zip(*rows)))
+        current = self._snapshot
+        keep = current.mask_not(added.ids)
+        self._snapshot = CatalogSnapshot(
+            ids=np.concatenate([current.ids[keep], added.ids]),
+            embeddings=np.vstack([current.embeddings[keep], added.embeddings]),
+            colors=np.vstack([current.colors[keep], added.colors]),
+            abstract=np.concatenate([current.abstract[keep], added.abstract]),
+            noisy=np.concatenate([current.noisy[keep], added.noisy]),
+            paint=np.concatenate([current.paint[keep], added.paint])
+        )
+        for listener in self._listeners:
+            listener.on_catalog_added(self._snapshot, list(added.ids))
+
+    def remove(self, artwork_ids):
+        current = self._snapshot
+        keep = current.mask_not(artwork_ids)
+        if keep.all():
+            return
+        removed = list(current.ids[~keep])
+        self._snapshot = CatalogSnapshot(
+            ids=current.ids[keep],
+            embeddings=current.embeddings[keep],
+            colors=current.colors[keep],
+            abstract=current.abstract[keep],
+            noisy=current.noisy[keep],
+            paint=current.paint[keep]
+        )
+        for listener in self._listeners:
+            listener.on_catalog_removed(self._snapshot, removed)
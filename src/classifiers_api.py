@@ -10,9 +10,20 @@ class ClassifiersApi:
 	def __init__(self):
 		self.classes = ['noisy', 'abstract', 'paint']
 		self.models = dict(noisy=joblib.load(Config.noisy_model_path), abstract=joblib.load(Config.abstract_model_path), paint=joblib.load(Config.paint_model_path))
+		# all three are linear regressions: packed into one (768, 3) weight matrix + bias, scored as one matmul
+		self.weights = np.stack([np.ravel(self.models[cls].coef_) for cls in self.classes], axis=1)
+		self.bias = np.array([float(np.ravel(self.models[cls].intercept_)[0]) for cls in self.classes])
+	
+	def predict_matrix(self, embeddings) -> np.ndarray:
+		"""(N, 768) or (768,) embeddings -> (N, 3) scores, columns in self.classes order"""
+		return np.atleast_2d(np.asarray(embeddings)) @ self.weights + self.bias
+	
+	def predict_from_embeddings(self, embeddings) -> dict:
+		"""batch variant: one (N,) array per class"""
+		scores = self.predict_matrix(embeddings)
+		return {cls: scores[:, i] for i, cls in enumerate(self.classes)}
 	
 	def predict_from_embedding(self, embedding: list[float]) -> dict:
-		embedding_np = np.array(embedding).reshape(1, -1)
-		predictions = {cls: float(self.models[cls].predict(embedding_np)[0]) for cls in self.classes}
-		return predictions
+		scores = self.predict_matrix(embedding)[0]
+		return {cls: float(scores[i]) for i, cls in enumerate(self.classes)}
 
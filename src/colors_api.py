@@ -7,20 +7,33 @@ from src.config import Config
 import requests
 from io import BytesIO
 from tqdm import tqdm
+from src.embedding_cache import EmbeddingCache, CONTENT_HASH_KEY, content_hash, image_key
 
 class ColorsApi:
 	
 	def __init__(self):
 		self.n_bins = Config.colors_n_bins
+		self.cache = EmbeddingCache(f"colors-hsv{self.n_bins}", self.n_bins) if Config.embedding_cache_enabled else None
 	
 	def predict_from_path(self, image_path: str) -> list[float]:
 		if image_path.startswith("http://") or image_path.startswith("https://"):
 			response = requests.get(image_path)
 			response.raise_for_status()
-			pil_image = Image.open(BytesIO(response.content))
+			data = response.content
 		else:
-			pil_image = Image.open(image_path)
-		
+			with open(image_path, "rb") as f:
+				data = f.read()
+		pil_image = Image.open(BytesIO(data))
+		pil_image.info[CONTENT_HASH_KEY] = content_hash(data)
+		return self.predict_from_image(pil_image)
+	
+	def predict_from_image(self, pil_image: Image.Image) -> list[float]:
+		key = image_key(pil_image)
+		if self.cache is None or key is None:
+			return self._histogram(pil_image)
+		return self.cache.get_or_compute([key], lambda missing: [self._histogram(pil_image)])[0].tolist()
+	
+	def _histogram(self, pil_image: Image.Image) -> list[float]:
 		# Convert grayscale images to RGB
 		if pil_image.mode != 'RGB':
 			pil_image = pil_image.convert('RGB')
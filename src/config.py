@@ -1,9 +1,107 @@
+import os
+
+
 class Config:
 	noisy_model_path = "data/linear_regression_noise.pkl"
 	abstract_model_path = "data/linear_regression_abstract.pkl"
 	paint_model_path = "data/linear_regression_paint.pkl"
 	walls_model_path = "wall_art_model.pt"
 	colors_n_bins = 30
+	# 'binary': new rows store float32 bytes in embeddings_bin / colors_bin; 'json': legacy JSON columns
+	vector_storage = os.getenv("VECTOR_STORAGE", "binary")
+	walls_chunk_size = 4096
+	# content-addressed CLIP / color vector cache (src/embedding_cache.py)
+	embedding_cache_enabled = os.getenv("EMBEDDING_CACHE", "1") == "1"
+	embedding_cache_dir = "embeddings_cache/content"
+	embedding_cache_memory_size = 4096
+	# precomputed top-k artworks for the known walls (WallRecommendationCache)
+	# append-only EmbeddingStore prefixes ({path}.f32 + {path}.ids) of the wall / training-art CLIP vectors
+	wall_embeddings_path = "embeddings_cache/wall_embeddings"
+	art_embeddings_path = "embeddings_cache/art_embeddings"
+	wall_cache_enabled = True
+	wall_cache_top_k = 100
+	warm_up_models = True
+
+	# CPU inference (src/cpu_inference.py): 'fp32', 'int8' or 'compile'; only applied when CLIP runs on cpu.
+	# Decide with benchmarks/bench_cpu_inference.py; TORCH_THREADS=0 keeps torch's default thread count
+	clip_cpu_inference_mode = os.getenv("CLIP_CPU_INFERENCE", "fp32")
+	wall_cpu_inference_mode = os.getenv("WALL_CPU_INFERENCE", "fp32")
+	torch_threads = int(os.getenv("TORCH_THREADS", 0))
+
+	# executor pools for blocking work (src/executors.py)
+	io_workers = int(os.getenv("IO_WORKERS", 16))
+	inference_workers = int(os.getenv("INFERENCE_WORKERS", 2))
+	loop_lag_interval_seconds = 0.1
+	loop_lag_window = 600
+
+	# image downloads during ingestion
+	fetch_max_concurrency = 8
+	fetch_timeout_seconds = 20
+
+	# CLIP micro-batching across concurrent /add-artwork requests
+	clip_micro_batching = True
+	clip_max_batch_size = 16
+	clip_max_wait_ms = 10
+
+	# /bulk-add-artworks: artworks featurized and inserted per chunk
+	bulk_chunk_size = 32
+	# utils/backfill_embeddings.py: items per checkpoint, resume state of the artworks re-featurization
+	backfill_checkpoint_every = 256
+	backfill_state_path = "embeddings_cache/backfill_artworks.json"
+	# /delete-artworks: ids per DELETE ... RETURNING statement
+	delete_batch_size = 1000
+
+	# approximate nearest-neighbour shortlist for predict_artworks (False = exact scan).
+	# benchmarks/bench_ann.py with these defaults: recall@10 0.93 (min 0.6) at 20k artworks,
+	# 0.95 (min 0.7) at 100k, for ~2.7x less scan time. The liked-minus-disliked query is
+	# diffuse, so recall depends on the fraction of lists probed, not the shortlist size.
+	ann_enabled = False
+	ann_shortlist = 300
+	ann_n_lists = None  # None = sqrt(catalog size)
+	ann_n_probe = None  # lists scanned per query; None = ann_probe_fraction of the lists
+	ann_probe_fraction = 0.3
+	ann_min_catalog_size = 2000
+
+	# in-memory LRU of user preference profiles (src/profiles.py)
+	profile_cache_size = 10000
+	# rows per user_profiles upsert statement (asyncpg allows at most 32767 bind parameters)
+	profile_save_batch_size = 500
+	# a profile write that loses the version check to another process is re-read and retried this often
+	profile_save_attempts = 5
+
+	# write-behind logging of /user-interaction feedback (src/interaction_buffer.py)
+	async_interactions = os.getenv("ASYNC_INTERACTIONS", "0") == "1"
+	interaction_flush_size = 500
+	interaction_flush_seconds = 1.0
+	# base name: each worker process spills to interaction_spill.<pid>.jsonl and replays exited workers' files
+	interaction_spill_path = os.getenv("INTERACTION_SPILL_PATH", "interaction_spill.jsonl")
+	interaction_spill_fsync = False
+
+	# diversification of the top of the ranking: 'mmr', 'farthest_point' or 'spectral'
+	n_recommendations = 10
+	diversity_strategy = 'mmr'
+	diversity_pool_size = 30
+	mmr_lambda = 0.5
+
+	# connection pool (db.py); size it against io_workers / the number of uvicorn workers
+	db_echo = os.getenv("DB_ECHO", "0") == "1"
+	db_pool_size = int(os.getenv("DB_POOL_SIZE", 10))
+	db_max_overflow = int(os.getenv("DB_MAX_OVERFLOW", 10))
+	db_pool_timeout_seconds = float(os.getenv("DB_POOL_TIMEOUT", 30))
+	db_pool_recycle_seconds = int(os.getenv("DB_POOL_RECYCLE", 1800))
+	db_pool_pre_ping = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+	db_statement_timeout_ms = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", 30000))  # 0 = no timeout
+	db_statement_cache_size = int(os.getenv("DB_STATEMENT_CACHE_SIZE", 100))
+	# True/False forces it; None = detect a transaction-mode pooler (port 6543 / *.pooler.*) from the URL
+	db_transaction_pooler = {"1": True, "0": False}.get(os.getenv("DB_TRANSACTION_POOLER", ""))
+
+	# retries and circuit breaker for database calls (src/resilience.py)
+	retry_max_attempts = 4
+	retry_base_delay_seconds = 0.2
+	retry_max_delay_seconds = 5.0
+	breaker_failure_threshold = 5
+	breaker_reset_seconds = 30.0
+	db_connect_attempts = int(os.getenv("DB_CONNECT_ATTEMPTS", 10))
 
 	db_name = "aiarts"
 	db_user_name="moshe"
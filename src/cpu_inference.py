@@ -0,0 +1,29 @@
+import copy
+import torch
+import torch.nn as nn
+
+from src.config import Config
+
+# 'fp32': unchanged; 'int8': dynamic int8 quantization of every nn.Linear (weights int8,
+# activations quantized on the fly); 'compile': torch.compile, falling back to eager on errors.
+CPU_INFERENCE_MODES = ("fp32", "int8", "compile")
+
+
+def set_torch_threads(n_threads: int = Config.torch_threads):
+    """0 keeps torch's default (one thread per core)."""
+    if n_threads > 0:
+        torch.set_num_threads(n_threads)
+
+
+def optimize_for_cpu(module: nn.Module, mode: str, inplace: bool = False) -> nn.Module:
+    if mode not in CPU_INFERENCE_MODES:
+        raise ValueError(f"Unknown CPU inference mode '{mode}', expected one of {list(CPU_INFERENCE_MODES)}")
+    if mode == "fp32":
+        return module
+    module = module if inplace else copy.deepcopy(module)
+    module.eval()
+    if mode == "int8":
+        return torch.ao.quantization.quantize_dynamic(module, {nn.Linear}, dtype=torch.qint8)
+    import torch._dynamo as dynamo
+    dynamo.config.suppress_errors = True
+    return torch.compile(module)
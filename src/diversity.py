@@ -0,0 +1,86 @@
+import heapq
+import numpy as np
+from collections import defaultdict
+
+from src.config import Config
+from src.ann_index import l2_normalize
+
+
+# Every strategy takes the scores and embeddings of the top-K pool (best first) and
+# returns the positions, within that pool, of the n items to recommend.
+
+def mmr_rerank(scores: np.ndarray, embeddings: np.ndarray, n: int, lambda_=Config.mmr_lambda) -> list:
+    """Maximal marginal relevance: lambda * relevance - (1 - lambda) * max similarity to the picks."""
+    if len(scores) <= n:
+        return list(range(len(scores)))
+    vectors = l2_normalize(embeddings)
+    similarity = vectors @ vectors.T
+    spread = scores.max() - scores.min()
+    relevance = (scores - scores.min()) / spread if spread > 0 else np.zeros_like(scores)
+
+    selected = [int(np.argmax(relevance))]
+    max_sim = similarity[selected[0]].copy()
+    available = np.ones(len(scores), dtype=bool)
+    available[selected[0]] = False
+    while len(selected) < n:
+        mmr = np.where(available, lambda_ * relevance - (1 - lambda_) * max_sim, -np.inf)
+        pick = int(np.argmax(mmr))
+        selected.append(pick)
+        available[pick] = False
+        max_sim = np.maximum(max_sim, similarity[pick])
+    return selected
+
+
+def farthest_point_rerank(scores: np.ndarray, embeddings: np.ndarray, n: int) -> list:
+    """Greedy farthest-point: start from the best item, then repeatedly add the item least similar to the picks."""
+    if len(scores) <= n:
+        return list(range(len(scores)))
+    vectors = l2_normalize(embeddings)
+    similarity = vectors @ vectors.T
+
+    selected = [int(np.argmax(scores))]
+    max_sim = similarity[selected[0]].copy()
+    max_sim[selected[0]] = np.inf
+    while len(selected) < n:
+        pick = int(np.argmin(max_sim))
+        selected.append(pick)
+        max_sim = np.maximum(max_sim, similarity[pick])
+        max_sim[pick] = np.inf
+    return selected
+
+
+def spectral_rerank(scores: np.ndarray, embeddings: np.ndarray, n: int, n_clusters: int = 5, per_cluster: int = 2) -> list:
+    """Spectral clustering of the pool, then the best per_cluster items of every cluster."""
+    from sklearn.cluster import SpectralClustering
+
+    if len(scores) <= n:
+        return list(range(len(scores)))
+    n_clusters = min(n_clusters, len(embeddings))
+    clustering = SpectralClustering(n_clusters=n_clusters, affinity='nearest_neighbors', assign_labels='kmeans', random_state=42)
+    labels = clustering.fit_predict(embeddings)
+
+    clusters = defaultdict(list)
+    for idx, label in enumerate(labels):
+        clusters[label].append(idx)
+
+    selected = []
+    for cluster in clusters.values():
+        selected.extend(heapq.nlargest(per_cluster, cluster, key=lambda idx: scores[idx]))
+
+    if len(selected) < n:
+        extras = [idx for idx in np.argsort(-scores) if idx not in selected]
+        selected += extras[:n - len(selected)]
+    return selected
+
+
+DIVERSIFIERS = {
+    'mmr': mmr_rerank,
+    'farthest_point': farthest_point_rerank,
+    'spectral': spectral_rerank,
+}
+
+
+def diversify(scores: np.ndarray, embeddings: np.ndarray, n: int, strategy: str = Config.diversity_strategy) -> list:
+    if strategy not in DIVERSIFIERS:
+        raise ValueError(f"Unknown diversity strategy '{strategy}', expected one of {list(DIVERSIFIERS)}")
+    return DIVERSIFIERS[strategy](scores, embeddings, n)
@@ -0,0 +1,95 @@
+import os
+import re
+import hashlib
+import threading
+import numpy as np
+from collections import OrderedDict
+
+from src.config import Config
+from src.embedding_store import EmbeddingStore
+
+# PIL images decoded from downloaded bytes carry the hash of those bytes in image.info
+CONTENT_HASH_KEY = "content_sha256"
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def image_key(image):
+    """Content hash of a PIL image decoded by ingest.decode_image / embed_model.load_image, else None."""
+    return getattr(image, "info", {}).get(CONTENT_HASH_KEY)
+
+
+class EmbeddingCache:
+    """
+    Content-addressed vector cache for one model: key = sha256 of the image bytes, so the
+    same picture is embedded once whatever URL it comes from, and the model name selects the
+    store, so vectors from another model are never returned. Two tiers: an in-memory LRU of
+    memory_size vectors in front of an append-only memory-mapped EmbeddingStore.
+    """
+
+    def __init__(self, model_name: str, dim: int, directory: str = Config.embedding_cache_dir,
+                 memory_size: int = Config.embedding_cache_memory_size):
+        self.model_name = model_name
+        self.dim = dim
+        self.memory_size = memory_size
+        self.store = EmbeddingStore(os.path.join(directory, re.sub(r"[^\w.-]", "_", model_name)), dim)
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _remember(self, key, vector):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        if key is None:
+            return None
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return vector
+        vector = self.store.get(key)
+        if vector is None:
+            self.store.refresh()  # another worker may have written it
+            vector = self.store.get(key)
+        with self._lock:
+            if vector is None:
+                self.misses += 1
+                return None
+            vector = np.array(vector)
+            self._remember(key, vector)
+            self.hits += 1
+            return vector
+
+    def get_many(self, keys) -> list:
+        return [self.get(key) for key in keys]
+
+    def put_many(self, keys, vectors):
+        pairs = [(key, np.asarray(vector, dtype=np.float32)) for key, vector in zip(keys, vectors) if key is not None]
+        if not pairs:
+            return
+        with self._lock:
+            for key, vector in pairs:
+                self._remember(key, vector)
+        self.store.append([key for key, _ in pairs], [vector for _, vector in pairs])
+
+    def get_or_compute(self, keys, compute) -> np.ndarray:
+        """Vectors for keys; compute(positions) is called once with the positions that missed and must return their vectors."""
+        vectors = self.get_many(keys)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            computed = compute(missing)
+            self.put_many([keys[i] for i in missing], computed)
+            for i, vector in zip(missing, computed):
+                vectors[i] = np.asarray(vector, dtype=np.float32)
+        return np.stack(vectors) if vectors else np.empty((0, self.dim), dtype=np.float32)
+
+    def stats(self) -> dict:
+        return dict(model=self.model_name, memory=len(self._memory), disk=len(self.store), hits=self.hits, misses=self.misses)
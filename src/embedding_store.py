@@ -0,0 +1,127 @@
+import os
+import json
+import fcntl
+import threading
+import numpy as np
+
+VECTOR_DTYPE = np.dtype("<f4")
+
+
+class EmbeddingStore:
+    """
+    Append-only on-disk matrix of float32 vectors plus an id -> row index:
+        {path}.f32  raw (n, dim) little-endian float32 rows
+        {path}.ids  one JSON-encoded id per line, line i = row i
+    Reads go through np.memmap (zero-copy, pages shared between processes); appends only
+    write the new rows and lines. Vectors are written before their ids, so a crash can at
+    worst leave unreferenced trailing bytes, which are cut off on the next append.
+    """
+
+    def __init__(self, path: str, dim: int):
+        self.path = path
+        self.dim = dim
+        self.vectors_path = path + ".f32"
+        self.ids_path = path + ".ids"
+        self._lock = threading.Lock()
+        self._ids = []
+        self._index = {}
+        self._ids_offset = 0
+        self._matrix = np.empty((0, dim), dtype=VECTOR_DTYPE)
+        self.refresh()
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, key):
+        return key in self._index
+
+    @property
+    def ids(self) -> list:
+        return list(self._ids)
+
+    def refresh(self):
+        """Pick up rows appended since the last read (by this or another process)."""
+        with self._lock:
+            self._read_new_ids()
+
+    def _read_new_ids(self):
+        """
+        get()/matrix() run lock-free on executor threads, so the grown matrix is published
+        before any new id becomes visible: a reader never gets a row past the end of _matrix.
+        """
+        if not os.path.exists(self.ids_path) or os.path.getsize(self.ids_path) == self._ids_offset:
+            return
+        with open(self.ids_path, "rb") as f:
+            f.seek(self._ids_offset)
+            data = f.read()
+        complete = data[:data.rfind(b"\n") + 1]  # ignore a torn last line
+        lines = complete.splitlines(keepends=True)[:max(self._vector_rows() - len(self._ids), 0)]
+        if not lines:
+            return
+        keys = [json.loads(line) for line in lines]
+        rows = len(self._ids) + len(keys)
+        self._matrix = np.memmap(self.vectors_path, dtype=VECTOR_DTYPE, mode="r", shape=(rows, self.dim))
+        for key in keys:
+            self._index[key] = len(self._ids)
+            self._ids.append(key)
+        self._ids_offset += sum(map(len, lines))
+
+    def _vector_rows(self) -> int:
+        if not os.path.exists(self.vectors_path):
+            return 0
+        return os.path.getsize(self.vectors_path) // (self.dim * VECTOR_DTYPE.itemsize)
+
+    def matrix(self) -> np.ndarray:
+        """Read-only (n, dim) view, row i belongs to ids[i]."""
+        return self._matrix
+
+    def get(self, key):
+        row = self._index.get(key)
+        return None if row is None else self._matrix[row]
+
+    def get_many(self, keys) -> list:
+        return [self.get(key) for key in keys]
+
+    def as_dict(self) -> dict:
+        return {key: self._matrix[row] for row, key in enumerate(self._ids)}
+
+    def append(self, keys, vectors) -> int:
+        """Append the rows whose id isn't stored yet; returns how many were written."""
+        vectors = np.asarray(vectors, dtype=VECTOR_DTYPE).reshape(-1, self.dim)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with self._lock, open(self.ids_path, "ab") as ids_file:
+            fcntl.flock(ids_file, fcntl.LOCK_EX)  # one writer at a time across processes
+            try:
+                self._read_new_ids()
+                new = {}
+                for key, vector in zip(keys, vectors):
+                    if key not in self._index and key not in new:
+                        new[key] = vector
+                if not new:
+                    return 0
+                with open(self.vectors_path, "ab") as vectors_file:
+                    vectors_file.truncate(len(self._ids) * self.dim * VECTOR_DTYPE.itemsize)
+                    vectors_file.write(np.stack(list(new.values())).astype(VECTOR_DTYPE).tobytes())
+                    vectors_file.flush()
+                    os.fsync(vectors_file.fileno())
+                ids_file.truncate(self._ids_offset)
+                ids_file.write(b"".join(json.dumps(key).encode() + b"\n" for key in new))
+                ids_file.flush()
+                self._read_new_ids()
+                return len(new)
+            finally:
+                fcntl.flock(ids_file, fcntl.LOCK_UN)
+
+
+def open_store(path: str, dim: int = 768) -> EmbeddingStore:
+    """Open the store at path, importing a legacy {path}.pkl dict[id -> vector] cache the first time."""
+    store = EmbeddingStore(path, dim)
+    legacy_path = path + ".pkl"
+    if not len(store) and os.path.exists(legacy_path):
+        import pickle
+        with open(legacy_path, "rb") as f:
+            legacy = pickle.load(f)
+        if legacy:
+            store.append([key.item() if isinstance(key, np.generic) else key for key in legacy], np.stack(list(legacy.values())))
+        print(f"Imported {len(store)} embeddings from {legacy_path}")
+    return store
@@ -3,15 +3,57 @@ import polars as pl
 from utils.embed_model import ClipEmbed
 import json
 from src.config import Config
+from src.batcher import MicroBatcher
+from src.executors import run_inference, run_io
+from src.embedding_cache import image_key
 from tqdm import tqdm
 
 
 class EmbeddingsApi:
-	def __init__(self):
+	def __init__(self, embed_model: ClipEmbed = None):
 		self.batch_size: int = 16
 		self.embed_dim: int = 768
-		self.embed_model = ClipEmbed()
+		self.embed_model = embed_model if embed_model is not None else ClipEmbed()
+		self.batcher = MicroBatcher(self._encode_batch, max_batch_size=Config.clip_max_batch_size, max_wait_ms=Config.clip_max_wait_ms) if Config.clip_micro_batching else None
+	
+	def _encode_batch(self, tensors: list) -> np.ndarray:
+		return np.concatenate([self.embed_model.encode_tensors(tensors[i:i + self.batch_size]) for i in range(0, len(tensors), self.batch_size)])
 	
 	def predict_from_path(self, image_path: str) -> list[float]:
 		embedding = self.embed_model.predict_imgs([image_path])[0]
-		return embedding.tolist()
\ No newline at end of file
+		return embedding.tolist()
+	
+	def predict_from_image(self, image) -> list[float]:
+		embedding = self.embed_model.predict_images([image])[0]
+		return embedding.tolist()
+	
+	def predict_from_images(self, images: list) -> np.ndarray:
+		"""all images of an artwork in as few encode_image calls as batch_size allows"""
+		cache = self.embed_model.cache
+		if cache is None:
+			return self._encode_batch([self.embed_model.preprocess(image) for image in images])
+		return cache.get_or_compute(
+			[image_key(image) for image in images],
+			lambda missing: self._encode_batch([self.embed_model.preprocess(images[i]) for i in missing])
+		)
+	
+	async def embed_images(self, images: list) -> np.ndarray:
+		"""async variant: preprocessed images from concurrent requests share forward passes through the micro-batcher"""
+		if self.batcher is None:
+			return await run_inference(self.predict_from_images, images)
+		cache = self.embed_model.cache
+		keys = [image_key(image) for image in images]
+		cached = await run_io(cache.get_many, keys) if cache is not None else [None] * len(images)
+		missing = [i for i, vector in enumerate(cached) if vector is None]
+		if missing:
+			tensors = await run_inference(lambda: [self.embed_model.preprocess(images[i]) for i in missing])
+			computed = await self.batcher.submit_many(tensors)
+			if cache is not None:
+				await run_io(cache.put_many, [keys[i] for i in missing], computed)
+			for i, vector in zip(missing, computed):
+				cached[i] = vector
+		return np.stack(cached)
+	
+	async def close(self):
+		if self.batcher is not None:
+			await self.batcher.close()
@@ -0,0 +1,78 @@
+import asyncio
+import functools
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from src.config import Config
+
+# Blocking work never runs on the event loop. I/O (file reads, image decoding) and
+# model inference (CLIP, OpenCV, sklearn, torch, numpy scoring) get separate pools so
+# a burst of downloads cannot starve inference and vice versa. Threads rather than
+# processes: torch / numpy / OpenCV release the GIL, and the models stay loaded once.
+io_executor = ThreadPoolExecutor(max_workers=Config.io_workers, thread_name_prefix="io")
+inference_executor = ThreadPoolExecutor(max_workers=Config.inference_workers, thread_name_prefix="inference")
+
+
+async def run_io(fn, *args, **kwargs):
+    return await asyncio.get_running_loop().run_in_executor(io_executor, functools.partial(fn, *args, **kwargs))
+
+
+async def run_inference(fn, *args, **kwargs):
+    return await asyncio.get_running_loop().run_in_executor(inference_executor, functools.partial(fn, *args, **kwargs))
+
+
+def shutdown_executors():
+    io_executor.shutdown(wait=False, cancel_futures=True)
+    inference_executor.shutdown(wait=False, cancel_futures=True)
+
+
+class EventLoopLagMonitor:
+    """
+    Sleeps for `interval` seconds in a loop and records how late it wakes up.
+    The lateness is the time the loop spent running something else without yielding.
+    """
+
+    def __init__(self, interval: float = Config.loop_lag_interval_seconds, window: int = Config.loop_lag_window):
+        self.interval = interval
+        self.lags = deque(maxlen=window)
+        self.max_lag = 0.0
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - start - self.interval)
+            self.lags.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+
+    def stats(self) -> dict:
+        lags = np.array(self.lags) * 1000
+        if not len(lags):
+            return {"samples": 0}
+        return {
+            "samples": len(lags),
+            "interval_ms": self.interval * 1000,
+            "last_ms": float(lags[-1]),
+            "mean_ms": float(lags.mean()),
+            "p50_ms": float(np.percentile(lags, 50)),
+            "p99_ms": float(np.percentile(lags, 99)),
+            "max_window_ms": float(lags.max()),
+            "max_ms": self.max_lag * 1000,
+        }
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
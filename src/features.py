@@ -1,6 +1,11 @@
-from src.classifiers_api import ClassifiersApi
+from src.registry import ModelRegistry
 from src.colors_api import ColorsApi
 from src.embeddings_api import EmbeddingsApi
+from src.catalog import Catalog
+from src.ingest import ImageFetcher
+from src.executors import run_inference
+from src.vector_codec import encode_vector, decode_vectors
+from src.resilience import db_retry
 import numpy as np
 import json
 import polars as pl
@@ -8,85 +13,61 @@ from src.config import Config
 import os
 import asyncio
 
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy import select, not_
+from sqlalchemy import select, delete
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from models_db import ArtworkDB
 from models import Artwork
-from db import engine
+from db import SessionLocal
 
 class Features:
-    def __init__(self):
-        self.embeddings_api = EmbeddingsApi()
-        self.classifier_api = ClassifiersApi()
+    def __init__(self, registry: ModelRegistry = None):
+        registry = (registry if registry is not None else ModelRegistry()).load()
+        self.embeddings_api = EmbeddingsApi(embed_model=registry.clip)
+        self.classifier_api = registry.classifiers
         self.colors_api = ColorsApi()
+        self.image_fetcher = ImageFetcher()
 
-        self.engine = engine
-        self.AsyncSessionLocal = sessionmaker(self.engine, class_=AsyncSession, expire_on_commit=False)
+        self.AsyncSessionLocal = SessionLocal
+        self.catalog = Catalog(embed_dim=self.embeddings_api.embed_dim, n_colors=self.colors_api.n_bins)
 
-    async def get_ids_np(self, artwork_id):
-        print("get ids")
-        async with self.AsyncSessionLocal() as session:
-            result = await session.execute(
-                select(
-                    ArtworkDB.embeddings,
-                    ArtworkDB.colors,
-                    ArtworkDB.abstract,
-                    ArtworkDB.noisy,
-                    ArtworkDB.paint
-                ).where(ArtworkDB.artwork_id.in_(artwork_id))
-            )
-            rows = result.all()
-
-        embeddings = np.array([row[0] for row in rows])
-        colors = np.array([row[1] for row in rows])
-        abstract = np.array([row[2] for row in rows])
-        noisy = np.array([row[3] for row in rows])
-        paint = np.array([row[4] for row in rows])
-        classifiers = np.stack([abstract, noisy, paint], axis=1)
+    def _vector_columns(self, rows, first: int) -> tuple:
+        """Decode (embeddings_bin, embeddings, colors_bin, colors) starting at rows[:, first] into two float32 matrices."""
+        embeddings = decode_vectors([row[first] for row in rows], [row[first + 1] for row in rows], self.embeddings_api.embed_dim)
+        colors = decode_vectors([row[first + 2] for row in rows], [row[first + 3] for row in rows], self.colors_api.n_bins)
+        return embeddings, colors
 
-        return dict(
-            embeddings=embeddings,
-            colors=colors,
-            classifiers=classifiers,
-            abstract=abstract,
-            noisy=noisy,
-            paint=paint
-        )
-
-    async def get_not_ids_np(self, artwork_id):
-        print("get no ids")
+    async def load_catalog(self):
+        print("load catalog")
         async with self.AsyncSessionLocal() as session:
             result = await session.execute(
                 select(
                     ArtworkDB.artwork_id,
+                    ArtworkDB.embeddings_bin,
                     ArtworkDB.embeddings,
+                    ArtworkDB.colors_bin,
                     ArtworkDB.colors,
                     ArtworkDB.abstract,
                     ArtworkDB.noisy,
                     ArtworkDB.paint
-                ).where(not_(ArtworkDB.artwork_id.in_(artwork_id)))
+                )
             )
             rows = result.all()
 
-        ids = np.array([row[0] for row in rows])
-        embeddings = np.array([row[1] for row in rows])
-        colors = np.array([row[2] for row in rows])
-        abstract = np.array([row[3] for row in rows])
-        noisy = np.array([row[4] for row in rows])
-        paint = np.array([row[5] for row in rows])
-        classifiers = np.stack([abstract, noisy, paint], axis=1)
-
-        return dict(
-            ids=ids,
-            embeddings=embeddings,
-            colors=colors,
-            classifiers=classifiers,
-            abstract=abstract,
-            noisy=noisy,
-            paint=paint
-        )
+        def load():
+            embeddings, colors = self._vector_columns(rows, 1)
+            self.catalog.load_columns(
+                ids=[row[0] for row in rows],
+                embeddings=embeddings,
+                colors=colors,
+                abstract=[row[5] for row in rows],
+                noisy=[row[6] for row in rows],
+                paint=[row[7] for row in rows]
+            )
+        await self.catalog.update(load)
 
+    async def close(self):
+        await self.image_fetcher.close()
+        await self.embeddings_api.close()
 
     async def get_all_ids_np(self):
         print("get all")
@@ -94,33 +75,6 @@ class Features:
             result = await session.execute(select(ArtworkDB.artwork_id))
             return np.array([row[0] for row in result.all()])
 
-    async def get_all_ids_with_embeddings_np(self):
-        print("get all ids with embeddings")
-        async with self.AsyncSessionLocal() as session:
-            result = await session.execute(
-                select(
-                    ArtworkDB.artwork_id,
-                    ArtworkDB.embeddings
-                )
-            )
-            rows = result.all()
-
-        ids = np.array([row[0] for row in rows])
-        embeddings = np.array([row[1] for row in rows])
-
-        return dict(
-            ids=ids,
-            embeddings=embeddings
-        )
-
-
-    async def get_pred_likes(self, artwork_id, sorted_indexes):
-        async with self.AsyncSessionLocal() as session:
-            result = await session.execute(select(ArtworkDB.artwork_id).where(not_(ArtworkDB.artwork_id.in_(artwork_id))))
-            artwork_ids = [row[0] for row in result.all()]
-            sorted_artwork_id = [artwork_ids[i] for i in sorted_indexes]
-            return sorted_artwork_id
-
     def _extract_np_from_rows(self, rows):
         embeddings = np.array([json.loads(e) for e in rows['embeddings']])
         colors = np.array([json.loads(e) for e in rows['colors']])
@@ -137,66 +91,209 @@ class Features:
     def read_images_ids(self):
         return [img[:-4] for img in os.listdir(Config.images_folder) if img.endswith('.jpg')]
 
-    async def add_artwork(self, artwork: Artwork): 
-        while True:
+    async def featurize(self, artwork: Artwork):
+        """Download, color-histogram and embed every image of an artwork. Returns the artworks row values, or None."""
+        images = await self.image_fetcher.fetch_images(artwork.images)
+
+        colors = []
+        valid_images = []
+        for path, image in zip(artwork.images, images):
+            if isinstance(image, Exception):
+                print(f"Failed to fetch {path}: {image}")
+                continue
+            try:
+                colors.append(await run_inference(self.colors_api.predict_from_image, image))
+            except Exception as e:
+                print(f"Failed to process colors for {path}: {e}")
+            valid_images.append(image)
+
+        embeddings = []
+        if valid_images:
+            try:
+                embeddings = list(await self.embeddings_api.embed_images(valid_images))
+            except Exception as e:
+                print(f"Failed to process embeddings for {artwork.artwork_id}: {e}")
+
+        if not colors or not embeddings:
+            print(f"All images failed for artwork {artwork.artwork_id}")
+            return None
+
+        avg_color = np.mean(colors, axis=0)
+        avg_embedding = np.mean(embeddings, axis=0)
+
+        classifier_preds = await run_inference(self.classifier_api.predict_from_embedding, avg_embedding)
+
+        return dict(
+            artwork_id=artwork.artwork_id,
+            artist_id=artwork.artist_id,
+            artist_name=artwork.artist_name,
+            artwork_name=artwork.artwork_name,
+            images=artwork.images,
+            description=artwork.description or "",
+            category=artwork.category or "",
+            properties={
+                "media": artwork.media,
+                "medium": artwork.medium,
+                "size": artwork.size,
+                "price": artwork.price,
+                "styles": artwork.styles,
+                "subject": artwork.subject,
+            },
+            **self._vector_values(avg_embedding, avg_color),
+            abstract=float(classifier_preds['abstract']),
+            noisy=float(classifier_preds['noisy']),
+            paint=float(classifier_preds['paint']),
+        )
+
+    def _vector_values(self, embedding, color) -> dict:
+        if Config.vector_storage == "json":
+            return dict(embeddings=embedding.tolist(), colors=color.tolist())
+        return dict(embeddings_bin=encode_vector(embedding), colors_bin=encode_vector(color))
+
+    def _catalog_row(self, row: dict):
+        embeddings, colors = self._vector_columns([(row.get('embeddings_bin'), row.get('embeddings'), row.get('colors_bin'), row.get('colors'))], 0)
+        return (row['artwork_id'], embeddings[0], colors[0], row['abstract'], row['noisy'], row['paint'])
+
+    async def add_artwork(self, artwork: Artwork):
+        # featurize outside any DB transaction / retry: only the DB round trips are retried
+        if await db_retry(lambda: self._existing_ids([artwork.artwork_id]), name="Artwork lookup"):
+            print(f"Artwork {artwork.artwork_id} already exists.")
+            return False
+
+        row = await self.featurize(artwork)
+        if row is None:
+            return False
+
+        print(f"classifiers from new_artwork={row['abstract']}, {row['noisy']}, {row['paint']}")
+        inserted = await db_retry(lambda: self._insert_rows([row]), name="Artwork insert")
+        if not inserted:
+            print(f"Artwork {artwork.artwork_id} already exists.")
+            return False
+        await self.catalog.update(self.catalog.add, *self._catalog_row(row))
+        return True
+
+    async def _existing_ids(self, artwork_ids):
+        async with self.AsyncSessionLocal() as session:
+            result = await session.execute(select(ArtworkDB.artwork_id).where(ArtworkDB.artwork_id.in_(artwork_ids)))
+            return {row[0] for row in result.all()}
+
+    async def _insert_rows(self, rows: list[dict]) -> set:
+        """Multi-row INSERT ... ON CONFLICT DO NOTHING; returns the ids actually inserted."""
+        async with self.AsyncSessionLocal() as session:
+            stmt = pg_insert(ArtworkDB).values(rows).on_conflict_do_nothing(index_elements=[ArtworkDB.artwork_id]).returning(ArtworkDB.artwork_id)
+            result = await session.execute(stmt)
+            inserted = {row[0] for row in result.all()}
+            await session.commit()
+        return inserted
+
+    async def _featurize_chunk(self, chunk: list):
+        """chunk: list of (line, Artwork or Exception). Returns per-item results and the rows to insert."""
+        results = {}
+        valid = [(line, artwork) for line, artwork in chunk if not isinstance(artwork, Exception)]
+        for line, error in chunk:
+            if isinstance(error, Exception):
+                results[line] = {"line": line, "status": "invalid", "error": str(error)}
+
+        try:
+            existing = await db_retry(lambda: self._existing_ids([artwork.artwork_id for _, artwork in valid]), name="Bulk artwork lookup") if valid else set()
+        except Exception as e:
+            print(f"Bulk lookup failed: {e}")
+            for line, artwork in valid:
+                results[line] = {"line": line, "artwork_id": artwork.artwork_id, "status": "failed", "error": "database lookup failed"}
+            return results, []
+        to_featurize = []
+        for line, artwork in valid:
+            if artwork.artwork_id in existing:
+                results[line] = {"line": line, "artwork_id": artwork.artwork_id, "status": "exists"}
+            else:
+                to_featurize.append((line, artwork))
+
+        rows = await asyncio.gather(*(self.featurize(artwork) for _, artwork in to_featurize), return_exceptions=True)
+        pending = []
+        for (line, artwork), row in zip(to_featurize, rows):
+            if isinstance(row, Exception) or row is None:
+                results[line] = {"line": line, "artwork_id": artwork.artwork_id, "status": "failed", "error": str(row) if row is not None else "all images failed"}
+            else:
+                pending.append((line, row))
+        return results, pending
+
+    async def _write_chunk(self, results: dict, pending: list) -> list:
+        if pending:
             try:
-                async with self.AsyncSessionLocal() as session:
-                    async with session.begin():
-                        result = await session.get(ArtworkDB, artwork.artwork_id)
-                        if result:
-                            print(f"Artwork {artwork.artwork_id} already exists.")
-                            return False
-
-                        colors = []
-                        for path in artwork.images:
-                            try:
-                                colors.append(self.colors_api.predict_from_path(path))
-                            except Exception as e:
-                                print(f"Failed to process colors for {path}: {e}")
-                        
-                        embeddings = []
-                        for path in artwork.images:
-                            try:
-                                embeddings.append(self.embeddings_api.predict_from_path(path))
-                            except Exception as e:
-                                print(f"Failed to process embeddings for {path}: {e}")
-                        
-                        if not colors or not embeddings:
-                            print(f"All images failed for artwork {artwork.artwork_id}")
-                            return False
-                        
-                        avg_color = np.mean(colors, axis=0)
-                        avg_embedding = np.mean(embeddings, axis=0)
-
-                        classifier_preds = self.classifier_api.predict_from_embedding(avg_embedding)
-
-                        new_artwork = ArtworkDB(
-                            artwork_id=artwork.artwork_id,
-                            artist_id=artwork.artist_id,
-                            artist_name=artwork.artist_name,
-                            artwork_name=artwork.artwork_name,
-                            images=artwork.images,
-                            description=artwork.description or "",
-                            category=artwork.category or "",
-                            properties={
-                                "media": artwork.media,
-                                "medium": artwork.medium,
-                                "size": artwork.size,
-                                "price": artwork.price,
-                                "styles": artwork.styles,
-                                "subject": artwork.subject,
-                            },
-                            embeddings=avg_embedding.tolist(),
-                            colors=avg_color.tolist(),
-                            abstract=float(classifier_preds['abstract']),
-                            noisy=float(classifier_preds['noisy']),
-                            paint=float(classifier_preds['paint']),
-                        )
-                        print(f"classifier_preds={classifier_preds}")
-                        print(f"classifiers from new_artwork={new_artwork.abstract}, {new_artwork.noisy}, {new_artwork.paint}")
-                        session.add(new_artwork)
-                    await session.commit()
-                return True
+                inserted = await db_retry(lambda: self._insert_rows([row for _, row in pending]), name="Bulk artwork insert")
             except Exception as e:
-                print(f"DB connection failed: {e}, retrying in 10s...")
-                await asyncio.sleep(10)
+                print(f"Bulk insert failed: {e}")
+                inserted = None
+            for line, row in pending:
+                if inserted is None:
+                    results[line] = {"line": line, "artwork_id": row['artwork_id'], "status": "failed", "error": "database write failed"}
+                elif row['artwork_id'] in inserted:
+                    results[line] = {"line": line, "artwork_id": row['artwork_id'], "status": "added"}
+                else:
+                    results[line] = {"line": line, "artwork_id": row['artwork_id'], "status": "exists"}
+            if inserted:
+                await self.catalog.update(self.catalog.add_many, [self._catalog_row(row) for _, row in pending if row['artwork_id'] in inserted])
+        return [results[line] for line in sorted(results)]
+
+    async def bulk_add_artworks(self, artworks, chunk_size: int = Config.bulk_chunk_size):
+        """
+        artworks: async iterable of (line, Artwork or parse Exception). Yields one result dict per item.
+        Chunks are pipelined: chunk i+1 is downloaded and embedded while chunk i is written.
+        """
+        seen = set()
+        write_task = None
+        chunk = []
+
+        async def flush(chunk):
+            nonlocal write_task
+            results, pending = await self._featurize_chunk(chunk)
+            if write_task is not None:
+                for result in await write_task:
+                    yield result
+            write_task = asyncio.create_task(self._write_chunk(results, pending))
+
+        async for line, artwork in artworks:
+            if not isinstance(artwork, Exception):
+                if artwork.artwork_id in seen:
+                    artwork = ValueError(f"duplicate artwork_id {artwork.artwork_id} in request")
+                else:
+                    seen.add(artwork.artwork_id)
+            chunk.append((line, artwork))
+            if len(chunk) >= chunk_size:
+                async for result in flush(chunk):
+                    yield result
+                chunk = []
+        if chunk:
+            async for result in flush(chunk):
+                yield result
+        if write_task is not None:
+            for result in await write_task:
+                yield result
+
+    async def _delete_returning(self, condition) -> list:
+        """One DELETE ... WHERE condition RETURNING artwork_id; no ORM objects are loaded."""
+        async with self.AsyncSessionLocal() as session:
+            result = await session.execute(delete(ArtworkDB).where(condition).returning(ArtworkDB.artwork_id))
+            deleted = [row[0] for row in result.all()]
+            await session.commit()
+        return deleted
+
+    async def delete_artworks(self, artwork_ids, batch_size: int = Config.delete_batch_size) -> list:
+        """
+        Deletes the given ids (missing ones are ignored) and evicts them from the catalog. Returns the deleted ids.
+        Each batch is evicted as soon as it is committed, so a failure in a later batch
+        never leaves already-deleted artworks in the catalog.
+        """
+        artwork_ids = list(dict.fromkeys(artwork_ids))
+        deleted = []
+        for start in range(0, len(artwork_ids), batch_size):
+            batch = artwork_ids[start:start + batch_size]
+            batch_deleted = await db_retry(lambda: self._delete_returning(ArtworkDB.artwork_id.in_(batch)), name="Deleting artworks")
+            await self.catalog.update(self.catalog.remove, batch_deleted)
+            deleted += batch_deleted
+        return deleted
+
+    async def delete_by_artist(self, artist_id: str) -> list:
+        deleted = await db_retry(lambda: self._delete_returning(ArtworkDB.artist_id == artist_id), name="Deleting artworks")
+        await self.catalog.update(self.catalog.remove, deleted)
+        return deleted
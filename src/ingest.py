@@ -0,0 +1,114 @@
+import asyncio
+import aiohttp
+from io import BytesIO
+from PIL import Image
+from pydantic import ValidationError
+from starlette.responses import StreamingResponse
+
+from src.config import Config
+from src.executors import run_io
+from src.embedding_cache import CONTENT_HASH_KEY, content_hash
+from models import Artwork
+
+
+def read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def decode_image(data: bytes) -> Image.Image:
+    image = Image.open(BytesIO(data)).convert("RGB")
+    image.info[CONTENT_HASH_KEY] = content_hash(data)
+    return image
+
+
+class ImageFetcher:
+    """
+    Downloads artwork images over one pooled aiohttp session. Every URL is fetched
+    once, concurrently (bounded by max_concurrency), with a per-URL timeout, and
+    decoded once so the same PIL image can feed both the colors and the CLIP path.
+    """
+
+    def __init__(self, max_concurrency: int = Config.fetch_max_concurrency, timeout: float = Config.fetch_timeout_seconds):
+        self.max_concurrency = max_concurrency
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._session = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self._session
+
+    async def fetch_bytes(self, path: str) -> bytes:
+        if not (path.startswith("http://") or path.startswith("https://")):
+            return await run_io(read_file, path)
+        async with self._semaphore:
+            async with self._get_session().get(path) as response:
+                response.raise_for_status()
+                return await response.read()
+
+    async def fetch_image(self, path: str) -> Image.Image:
+        data = await self.fetch_bytes(path)
+        return await run_io(decode_image, data)
+
+    async def fetch_images(self, paths: list[str]) -> list:
+        """Returns one PIL image, or the exception that prevented it, per path (same order)."""
+        return await asyncio.gather(*(self.fetch_image(path) for path in paths), return_exceptions=True)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse whose content is produced while the request body is still being read.
+    Starlette's StreamingResponse listens for http.disconnect from the start; that listener
+    competes with request.stream() for receive() and swallows the body messages. This one
+    only starts listening once body_read is set (see stream_request_body).
+    """
+
+    def __init__(self, content, body_read: asyncio.Event, **kwargs):
+        super().__init__(content, **kwargs)
+        self.body_read = body_read
+
+    async def listen_for_disconnect(self, receive):
+        await self.body_read.wait()
+        await super().listen_for_disconnect(receive)
+
+
+async def stream_request_body(request, body_read: asyncio.Event):
+    """request.stream(), setting body_read once the body is consumed (or reading it failed)."""
+    try:
+        async for chunk in request.stream():
+            yield chunk
+    finally:
+        body_read.set()
+
+
+async def iter_ndjson_artworks(chunks):
+    """
+    Parse a JSONL / NDJSON byte stream into (line_number, Artwork) pairs.
+    Lines that are not a valid Artwork yield (line_number, exception) instead.
+    """
+    buffer = b""
+    line_number = 0
+    async for data in chunks:
+        buffer += data
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_number += 1
+            if line.strip():
+                yield line_number, _parse_artwork(line)
+    if buffer.strip():
+        yield line_number + 1, _parse_artwork(buffer)
+
+
+def _parse_artwork(line: bytes):
+    try:
+        return Artwork.model_validate_json(line)
+    except ValidationError as e:
+        return ValueError(f"invalid artwork: {e.errors(include_url=False)}")
@@ -0,0 +1,196 @@
+import os
+import re
+import glob
+import json
+import fcntl
+import asyncio
+
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from src.config import Config
+from models_db import UserInteractionDB
+
+
+class InteractionBuffer:
+    """
+    Write-behind buffer for user_interactions. add() appends the interaction to a local
+    spill file and to memory and returns immediately; a background task writes the
+    buffer in multi-row INSERT ... ON CONFLICT DO NOTHING batches once it holds
+    flush_size interactions or every flush_seconds. Recommendations are computed from the
+    in-memory profiles, which are persisted in the same flush.
+
+    Crash safety: the spill file is only deleted after its interactions (and the profiles
+    they touched) are committed. Anything left over is replayed by start(); every write is
+    idempotent, so replaying an already-committed interaction is harmless.
+
+    Each process (uvicorn worker) spills to its own files, interaction_spill.<pid>.jsonl,
+    and holds an flock on interaction_spill.<pid>.lock while it runs. start() adopts the
+    leftovers of every process whose lock is free, i.e. which is no longer running.
+    """
+
+    def __init__(self, session_factory, profiles, spill_path: str = Config.interaction_spill_path,
+                 flush_size: int = Config.interaction_flush_size, flush_seconds: float = Config.interaction_flush_seconds):
+        self.session_factory = session_factory
+        self.profiles = profiles
+        self.profiles.write_behind = True
+        self.base_path = spill_path
+        self.spill_path, self.flushing_path, self.lock_path = self._paths(os.getpid())
+        self.flush_size = flush_size
+        self.flush_seconds = flush_seconds
+        self._pending = []
+        self._spill = None
+        self._wakeup = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task = None
+        self._lock_file = None
+
+    def _paths(self, pid=None) -> tuple:
+        """(spill, flushing, lock) paths of one process; pid None = the pre-per-process single spill file."""
+        if pid is None:
+            spill = self.base_path
+            return spill, spill + ".flushing", spill + ".lock"
+        root, ext = os.path.splitext(self.base_path)
+        spill = f"{root}.{pid}{ext}"
+        return spill, spill + ".flushing", f"{root}.{pid}.lock"
+
+    def _orphans(self) -> list:
+        """
+        Spill files of processes that are no longer running, as ((spill, flushing, lock), lock_file)
+        with the lock held, so two workers starting together never adopt the same leftovers.
+        """
+        root, ext = os.path.splitext(self.base_path)
+        pattern = re.compile(re.escape(root) + r"\.(\d+)\.")
+        pids = {int(match.group(1)) for path in glob.glob(glob.escape(root) + ".*") if (match := pattern.match(path))}
+        candidates = [self._paths(pid) for pid in sorted(pids - {os.getpid()})]
+        legacy = self._paths(None)
+        if os.path.exists(legacy[0]) or os.path.exists(legacy[1]):
+            candidates.append(legacy)
+        orphans = []
+        for paths in candidates:
+            lock_file = open(paths[2], "a")
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock_file.close()  # its process is still running
+                continue
+            orphans.append((paths, lock_file))
+        return orphans
+
+    def _read_spill(self, path) -> list:
+        if not os.path.exists(path):
+            return []
+        records = []
+        with open(path) as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    pass  # torn last line from a crash mid-write
+        return records
+
+    async def start(self):
+        """Replay interactions that exited processes spilled but did not flush, then start flushing."""
+        self._lock_file = open(self.lock_path, "a")
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX)  # held until close(): marks our files as live
+        orphans = self._orphans()
+        records = self._read_spill(self.flushing_path) + self._read_spill(self.spill_path)
+        for (spill_path, flushing_path, _), _ in orphans:
+            records += self._read_spill(flushing_path) + self._read_spill(spill_path)
+        # merge all leftovers into our spill file, atomically, before dropping the old ones
+        merged_path = self.spill_path + ".tmp"
+        with open(merged_path, "w") as f:
+            f.writelines(json.dumps(record) + "\n" for record in records)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(merged_path, self.spill_path)
+        if os.path.exists(self.flushing_path):
+            os.remove(self.flushing_path)
+        for paths, lock_file in orphans:
+            for path in paths:
+                if os.path.exists(path):
+                    os.remove(path)
+            lock_file.close()
+
+        self._spill = open(self.spill_path, "a")
+        self._pending = list(records)
+        for record in records:
+            await self.profiles.record(record["user_id"], record["artwork_id"], record["action"])
+        if records:
+            print(f"Replaying {len(records)} spilled interactions")
+            await self.flush()
+        self._task = asyncio.create_task(self._run())
+
+    def _append(self, record: dict):
+        self._spill.write(json.dumps(record) + "\n")
+        self._spill.flush()
+        if Config.interaction_spill_fsync:
+            os.fsync(self._spill.fileno())
+        self._pending.append(record)
+        if len(self._pending) >= self.flush_size:
+            self._wakeup.set()
+
+    def add(self, user_id: str, artwork_id: str, action: str):
+        self._append(dict(user_id=user_id, artwork_id=artwork_id, action=action))
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Interaction flush failed: {e}, retrying in {self.flush_seconds}s...")
+                await asyncio.sleep(self.flush_seconds)
+
+    async def flush(self):
+        async with self._lock:
+            if not self._pending and not self.profiles.has_dirty:
+                return
+            batch, self._pending = self._pending, []
+            # new interactions go to a fresh spill file while this batch is written
+            self._spill.close()
+            if os.path.exists(self.spill_path):
+                os.replace(self.spill_path, self.flushing_path)
+            self._spill = open(self.spill_path, "a")
+            try:
+                await self.profiles.flush_dirty(batch_size=self.flush_size)
+                if batch:
+                    async with self.session_factory() as session:
+                        # a batch put back by failed flushes (or replayed from a big spill) can exceed
+                        # asyncpg's 32767 bind parameters: at most flush_size rows per statement
+                        for start in range(0, len(batch), self.flush_size):
+                            stmt = pg_insert(UserInteractionDB).values(batch[start:start + self.flush_size]).on_conflict_do_nothing(
+                                index_elements=["user_id", "artwork_id", "action"]
+                            )
+                            await session.execute(stmt)
+                        await session.commit()
+            except Exception:
+                # put the batch back (and into the live spill file) so nothing is lost
+                pending, self._pending = self._pending, []
+                for record in batch + pending:
+                    self._append(record)
+                raise
+            finally:
+                if os.path.exists(self.flushing_path):
+                    os.remove(self.flushing_path)
+
+    async def close(self):
+        """Graceful drain for the shutdown hook."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush()
+        finally:
+            self._spill.close()
+            if not os.path.getsize(self.spill_path):
+                os.remove(self.spill_path)
+                os.remove(self.lock_path)
+            self._lock_file.close()
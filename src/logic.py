@@ -1,43 +1,69 @@
 import numpy as np
 from sklearn.metrics.pairwise import cosine_similarity
-from sklearn.cluster import SpectralClustering
-from collections import defaultdict
-import  heapq
 from typing import List
-import torch
 
-from train.train_walls_art import load_model
-from utils.embed_model import ClipEmbed
+from src.walls_logic import WallArtScorer, WallRecommendationCache, load_wall_embeddings, wall_id_from_path
+from src.ann_index import IVFIndex, l2_normalize
+from src.diversity import diversify
+from src.executors import run_inference
+from src.registry import ModelRegistry
 from src.features import Features
+from src.profiles import ProfileStore, UserProfile
 from src.config import Config
 from models import Artwork
 
 
 class Logic:
-    def __init__(self, model_path=Config.walls_model_path):
-        self.features = Features()
-        self.model = load_model(input_dim=1536, path=model_path)
-        self.model.eval()
-        self.clip = ClipEmbed()
+    def __init__(self, model_path=Config.walls_model_path, registry: ModelRegistry = None):
+        self.registry = (registry if registry is not None else ModelRegistry(walls_model_path=model_path)).load()
+        self.features = Features(self.registry)
+        self.model = self.registry.wall_model
+        self.clip = self.registry.clip
+        self.wall_scorer = WallArtScorer(self.model)
+        self.features.catalog.add_listener(self.wall_scorer)
+        wall_embeddings = load_wall_embeddings() if Config.wall_cache_enabled else {}
+        self.wall_cache = WallRecommendationCache(self.wall_scorer, wall_embeddings, self.registry.wall_model_version) if wall_embeddings else None
+        if self.wall_cache is not None:
+            self.features.catalog.add_listener(self.wall_cache)
+        self.profiles = ProfileStore(self.features.AsyncSessionLocal, self.features.catalog)
+        self.ann_index = IVFIndex() if Config.ann_enabled else None
+        if self.ann_index is not None:
+            self.features.catalog.add_listener(self.ann_index)
+
+    async def load_catalog(self):
+        await self.features.load_catalog()
+
+    async def close(self):
+        await self.features.close()
 
     async def add_artwork(self, artwork: Artwork):
         return await self.features.add_artwork(artwork)
 
-    def mean_or_zeros(self, data, key, default_shape):
-        if data is None or key not in data or data[key] is None:
+    def bulk_add_artworks(self, artworks):
+        return self.features.bulk_add_artworks(artworks)
+
+    async def delete_artworks(self, artwork_ids: List[str]) -> List[str]:
+        return await self.features.delete_artworks(artwork_ids)
+
+    async def delete_by_artist(self, artist_id: str) -> List[str]:
+        return await self.features.delete_by_artist(artist_id)
+
+    def mean_or_zeros(self, means, key, default_shape):
+        if means is None or key not in means or means[key] is None:
             return np.zeros(default_shape)
-        return np.mean(data[key].astype(float), axis=0) if data[key].size > 0 else np.zeros(default_shape)
+        return np.asarray(means[key], dtype=float)
 
     def score_scalar_feature(self, candidates, liked, disliked, name: str):
+        """liked / disliked: profile means (see FeedbackSide.means) or None."""
         candidates_col = candidates[name].astype(float)
 
-        has_liked = liked is not None and name in liked and len(liked[name]) > 0
-        has_disliked = disliked is not None and name in disliked and len(disliked[name]) > 0
+        has_liked = liked is not None and name in liked
+        has_disliked = disliked is not None and name in disliked
 
         if has_liked:
-            liked_val = np.mean(liked[name].astype(float))
+            liked_val = float(liked[name])
         if has_disliked:
-            disliked_val = np.mean(disliked[name].astype(float))
+            disliked_val = float(disliked[name])
 
         if has_liked and has_disliked:
             score = np.abs(candidates_col - disliked_val) - np.abs(candidates_col - liked_val)
@@ -58,19 +84,58 @@ class Logic:
 
         return normalized_score.reshape(-1, 1)
 
-    async def predict_artworks(self, artwork_id: List[int], target: List[int], embedding_weight: float = 0.4, color_weight: float = 0.3, abstract_weight: float = 0.1, noisy_weight: float = 0.1, paint_weight: float = 0.1):
-        liked_ids = [id for id, label in zip(artwork_id, target) if label == 1]
-        disliked_ids = [id for id, label in zip(artwork_id, target) if label == 0]
-        print(f"{len(liked_ids)=}, {len(disliked_ids)=}")
-
-        liked = await self.features.get_ids_np(artwork_id=liked_ids) if liked_ids else None
-        disliked = await self.features.get_ids_np(artwork_id=disliked_ids) if disliked_ids else None
-        candidates = await self.features.get_not_ids_np(artwork_id=artwork_id)
-
-        mean_liked_emb = self.mean_or_zeros(liked, 'embeddings', candidates['embeddings'].shape[1])
-        mean_dis_emb = self.mean_or_zeros(disliked, 'embeddings', candidates['embeddings'].shape[1])
-        mean_liked_col = self.mean_or_zeros(liked, 'colors', candidates['colors'].shape[1])
-        mean_dis_col = self.mean_or_zeros(disliked, 'colors', candidates['colors'].shape[1])
+    def select_candidates(self, catalog, artwork_id, mean_liked_emb, mean_dis_emb):
+        """
+        Exact path: every unseen artwork. ANN path: the shortlist closest to the
+        (liked - disliked) direction, which is what the embedding score ranks by.
+        """
+        if self.ann_index is None or not self.ann_index.ready:
+            return catalog.exclude(artwork_id)
+        query = l2_normalize(mean_liked_emb) - l2_normalize(mean_dis_emb)
+        shortlist = self.ann_index.search(query, k=Config.ann_shortlist + len(artwork_id))
+        seen = set(artwork_id)
+        return catalog.take([id for id in shortlist if id not in seen][:Config.ann_shortlist])
+
+    async def recommend_for_user(self, user_id: str, artwork_id: str, action: str, **kwargs):
+        """Apply one like / dislike to the user's stored profile and recommend from it."""
+        if not self.features.catalog.loaded:
+            await self.load_catalog()
+        profile = await self.profiles.record(user_id, artwork_id, action)
+        return await self.predict_from_profile(profile, **kwargs)
+
+    async def predict_from_profile(self, profile: UserProfile, embedding_weight: float = 0.4, color_weight: float = 0.3, abstract_weight: float = 0.1, noisy_weight: float = 0.1, paint_weight: float = 0.1, diversity_strategy: str = Config.diversity_strategy):
+        print(f"{profile.liked.count=}, {profile.disliked.count=}")
+        if not self.features.catalog.loaded:
+            await self.load_catalog()
+        return await run_inference(
+            self.score_artworks, self.features.catalog.snapshot(), list(profile.seen), profile.liked.means(), profile.disliked.means(),
+            embedding_weight, color_weight, abstract_weight, noisy_weight, paint_weight, diversity_strategy
+        )
+
+    async def predict_artworks(self, artwork_id: List[int], target: List[int], embedding_weight: float = 0.4, color_weight: float = 0.3, abstract_weight: float = 0.1, noisy_weight: float = 0.1, paint_weight: float = 0.1, diversity_strategy: str = Config.diversity_strategy):
+        """Recommend from an explicit interaction history (target 1 = like, 0 = dislike)."""
+        if not self.features.catalog.loaded:
+            await self.load_catalog()
+        catalog = self.features.catalog.snapshot()
+        profile = UserProfile(None, self.features.catalog.embed_dim, self.features.catalog.n_colors)
+        for id, label in zip(artwork_id, target):
+            if label in (0, 1):
+                profile.record(id, "like" if label == 1 else "dislike", catalog)
+        print(f"{profile.liked.count=}, {profile.disliked.count=}")
+
+        return await run_inference(
+            self.score_artworks, catalog, artwork_id, profile.liked.means(), profile.disliked.means(),
+            embedding_weight, color_weight, abstract_weight, noisy_weight, paint_weight, diversity_strategy
+        )
+
+    def score_artworks(self, catalog, artwork_id, liked, disliked, embedding_weight, color_weight, abstract_weight, noisy_weight, paint_weight, diversity_strategy):
+        """artwork_id: ids to exclude; liked / disliked: profile means or None."""
+        mean_liked_emb = self.mean_or_zeros(liked, 'embeddings', catalog.embeddings.shape[1])
+        mean_dis_emb = self.mean_or_zeros(disliked, 'embeddings', catalog.embeddings.shape[1])
+        mean_liked_col = self.mean_or_zeros(liked, 'colors', catalog.colors.shape[1])
+        mean_dis_col = self.mean_or_zeros(disliked, 'colors', catalog.colors.shape[1])
+
+        candidates = self.select_candidates(catalog, artwork_id, mean_liked_emb, mean_dis_emb)
 
         sim_liked_emb = cosine_similarity(candidates['embeddings'], mean_liked_emb.reshape(1, -1)).flatten()
         sim_dis_emb = cosine_similarity(candidates['embeddings'], mean_dis_emb.reshape(1, -1)).flatten()
@@ -86,27 +151,9 @@ class Logic:
         overall_score = (embedding_weight * emb_score + color_weight * col_score + abstract_weight * abstract_score + paint_weight * paint_score + noisy_weight * noisy_score)
         sorted_indexes = np.argsort(overall_score)[::-1]
 
-        top_30_indexes = sorted_indexes[:30]
-        top_30_embeddings = candidates['embeddings'][top_30_indexes]
-
-        n_clusters = min(5, len(top_30_embeddings))
-        clustering = SpectralClustering(n_clusters=n_clusters, affinity='nearest_neighbors', assign_labels='kmeans', random_state=42)
-        labels = clustering.fit_predict(top_30_embeddings)
-
-        clusters = defaultdict(list)
-        for idx, label in zip(top_30_indexes, labels):
-            clusters[label].append(idx)
-
-        selected_indexes = []
-        for cluster in clusters.values():
-            top_in_cluster = heapq.nlargest(2, cluster, key=lambda idx: overall_score[idx])
-            selected_indexes.extend(top_in_cluster)
-
-        if len(selected_indexes) < 10:
-            extras = [idx for idx in sorted_indexes if idx not in selected_indexes]
-            selected_indexes += extras[:10 - len(selected_indexes)]
-
-        selected_indexes = sorted(selected_indexes, key=lambda idx: overall_score[idx], reverse=True)
+        pool_indexes = sorted_indexes[:Config.diversity_pool_size]
+        picks = diversify(overall_score[pool_indexes], candidates['embeddings'][pool_indexes], n=Config.n_recommendations, strategy=diversity_strategy)
+        selected_indexes = sorted(pool_indexes[picks], key=lambda idx: overall_score[idx], reverse=True)
 
         # Prepare details for the predicted top 10 images
         top_predictions = []
@@ -115,25 +162,24 @@ class Logic:
 
         return top_predictions
     
-    async def predict_walls(self, wall_path, k=30):
+    async def rank_walls(self, wall_path, k=30):
+        if not self.features.catalog.loaded:
+            await self.load_catalog()
+
+        if self.wall_cache is not None:
+            cached = self.wall_cache.lookup(wall_id_from_path(wall_path), k)
+            if cached is not None:
+                return cached
+
         print("Predicting walls...")
-        wall_embedding = self.clip.predict_imgs([wall_path])[0]
-        wall_tensor = torch.tensor(wall_embedding, dtype=torch.float32).unsqueeze(0)
-
-        scores = {}
-        candidates = await self.features.get_all_ids_with_embeddings_np()
-        with torch.no_grad():
-            for art_id, feature in zip(candidates["ids"], candidates["embeddings"]):
-                art_embedding = feature
-                art_tensor = torch.tensor(art_embedding, dtype=torch.float32).unsqueeze(0)
-                input_tensor = torch.cat((wall_tensor, art_tensor), dim=1)
-                score = self.model(input_tensor).item()
-                scores[art_id] = score
+        wall_image = await self.features.image_fetcher.fetch_image(wall_path)
+        wall_embedding = (await run_inference(self.clip.predict_images, [wall_image]))[0]
 
         # Get top-k recommendations
-        top_k = sorted(scores.items(), key=lambda x: x[1], reverse=True)[:k]
-        top_k_ids, top_k_scores = zip(*top_k)
-        top_k_str = [str(id) for id in top_k_ids]
+        return await run_inference(self.wall_scorer.rank, wall_embedding, k=k)
+
+    async def predict_walls(self, wall_path, k=30):
+        top_k_str, _ = await self.rank_walls(wall_path, k=k)
         return top_k_str
 
 if __name__ == '__main__':
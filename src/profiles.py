@@ -0,0 +1,293 @@
+import asyncio
+import weakref
+import numpy as np
+from collections import OrderedDict
+
+from sqlalchemy import select, update, values, column, func, Integer, String, Text, LargeBinary
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
+
+from src.config import Config
+from src.resilience import backoff_delay
+from models_db import UserProfileDB, UserInteractionDB
+
+SCALARS = ('abstract', 'noisy', 'paint')
+SUM_DTYPE = np.dtype("<f8")
+# column types of the VALUES list that ProfileStore.save joins against user_profiles
+CHANGE_TYPES = dict(
+    user_id=String, version=Integer, liked_count=Integer, disliked_count=Integer,
+    liked_embeddings_sum=LargeBinary, liked_colors_sum=LargeBinary, liked_scalars_sum=LargeBinary,
+    disliked_embeddings_sum=LargeBinary, disliked_colors_sum=LargeBinary, disliked_scalars_sum=LargeBinary,
+    liked_new_ids=ARRAY(Text), disliked_new_ids=ARRAY(Text)
+)
+
+
+class FeedbackSide:
+    """Running sums over the artworks a user liked (or disliked), so means cost O(1)."""
+
+    def __init__(self, embed_dim: int, n_colors: int):
+        self.count = 0
+        self.artwork_ids = set()
+        self.embeddings_sum = np.zeros(embed_dim, dtype=np.float64)
+        self.colors_sum = np.zeros(n_colors, dtype=np.float64)
+        self.scalars_sum = np.zeros(len(SCALARS), dtype=np.float64)
+
+    def add(self, artwork_id, row):
+        """row: catalog.take([artwork_id]) result, or None when the artwork is unknown."""
+        self.artwork_ids.add(artwork_id)
+        if row is None or not len(row['ids']):
+            return
+        self.count += 1
+        self.embeddings_sum += row['embeddings'][0]
+        self.colors_sum += row['colors'][0]
+        self.scalars_sum += [row[name][0] for name in SCALARS]
+
+    def means(self):
+        """Same keys the scoring code reads; None when the user has no feedback on this side."""
+        if self.count == 0:
+            return None
+        scalars = self.scalars_sum / self.count
+        return dict(
+            embeddings=self.embeddings_sum / self.count,
+            colors=self.colors_sum / self.count,
+            **{name: scalars[i] for i, name in enumerate(SCALARS)}
+        )
+
+
+class UserProfile:
+    def __init__(self, user_id: str, embed_dim: int, n_colors: int):
+        self.user_id = user_id
+        self.liked = FeedbackSide(embed_dim, n_colors)
+        self.disliked = FeedbackSide(embed_dim, n_colors)
+        self.version = 0  # version of the user_profiles row this state is based on; 0 = no row yet
+        self.unsaved = []  # (artwork_id, action) applied since that row was read or written
+
+    @property
+    def seen(self) -> set:
+        return self.liked.artwork_ids | self.disliked.artwork_ids
+
+    def side(self, action: str) -> FeedbackSide:
+        return self.liked if action == "like" else self.disliked
+
+    def record(self, artwork_id, action: str, catalog) -> bool:
+        """Apply one interaction in O(1). Returns False if it was already applied."""
+        side = self.side(action)
+        if artwork_id in side.artwork_ids:
+            return False
+        side.add(artwork_id, catalog.take([artwork_id]))
+        self.unsaved.append((artwork_id, action))
+        return True
+
+    def _sums(self) -> dict:
+        values = {}
+        for name, side in (("liked", self.liked), ("disliked", self.disliked)):
+            values[f"{name}_count"] = side.count
+            values[f"{name}_embeddings_sum"] = side.embeddings_sum.astype(SUM_DTYPE).tobytes()
+            values[f"{name}_colors_sum"] = side.colors_sum.astype(SUM_DTYPE).tobytes()
+            values[f"{name}_scalars_sum"] = side.scalars_sum.astype(SUM_DTYPE).tobytes()
+        return values
+
+    def to_db_values(self) -> dict:
+        """The whole row, for the first INSERT of a profile."""
+        return dict(
+            user_id=self.user_id, version=self.version + 1, **self._sums(),
+            liked_ids=list(self.liked.artwork_ids), disliked_ids=list(self.disliked.artwork_ids)
+        )
+
+    def to_db_changes(self) -> dict:
+        """Update of an existing row: fixed-size sums plus only the ids seen since it was read (O(1) per click)."""
+        return dict(
+            user_id=self.user_id, version=self.version, **self._sums(),
+            liked_new_ids=[artwork_id for artwork_id, action in self.unsaved if action == "like"],
+            disliked_new_ids=[artwork_id for artwork_id, action in self.unsaved if action != "like"]
+        )
+
+    def mark_saved(self, clicks: list):
+        """The row now holds `clicks` (and everything before them)."""
+        self.version += 1
+        saved = set(clicks)
+        self.unsaved = [click for click in self.unsaved if click not in saved]
+
+    def load(self, record: UserProfileDB):
+        for name, side in (("liked", self.liked), ("disliked", self.disliked)):
+            side.count = getattr(record, f"{name}_count")
+            side.artwork_ids = set(getattr(record, f"{name}_ids"))
+            side.embeddings_sum = np.frombuffer(getattr(record, f"{name}_embeddings_sum"), dtype=SUM_DTYPE).copy()
+            side.colors_sum = np.frombuffer(getattr(record, f"{name}_colors_sum"), dtype=SUM_DTYPE).copy()
+            side.scalars_sum = np.frombuffer(getattr(record, f"{name}_scalars_sum"), dtype=SUM_DTYPE).copy()
+        self.version = record.version
+
+    def rebase(self, record: UserProfileDB, catalog):
+        """Another writer got there first: start from its row and re-apply our unsaved clicks."""
+        clicks, self.unsaved = self.unsaved, []
+        if record is None:
+            self.version = 0  # the row is gone: insert the state we have
+            self.unsaved = clicks
+            return
+        self.load(record)
+        for artwork_id, action in clicks:
+            self.record(artwork_id, action, catalog)
+
+    @classmethod
+    def from_db(cls, record: UserProfileDB, embed_dim: int, n_colors: int):
+        profile = cls(record.user_id, embed_dim, n_colors)
+        profile.load(record)
+        return profile
+
+
+class ProfileConflictError(Exception):
+    """A profile kept losing the version check to concurrent writers."""
+
+
+class ProfileStore:
+    """
+    Incrementally maintained user preference profiles: an in-memory LRU in front of the
+    user_profiles table. A user without a stored profile is rebuilt once from their
+    user_interactions history; afterwards every click is an O(1) update plus one UPDATE that
+    sends the fixed-size sums and appends the new id to the seen array.
+    With write_behind, changed profiles are only marked dirty and persisted in batches
+    by flush_dirty() (see src/interaction_buffer.py).
+
+    Several processes may cache the same user. Writes are optimistic: a row is only
+    updated if its version is still the one the cached profile was based on; otherwise
+    the profile is re-read, its unsaved clicks re-applied and the write retried, so a
+    stale cache never overwrites clicks saved by another process.
+    """
+
+    def __init__(self, session_factory, catalog, capacity: int = Config.profile_cache_size):
+        self.session_factory = session_factory
+        self.catalog = catalog
+        self.capacity = capacity
+        self.write_behind = False
+        self._cache = OrderedDict()
+        self._dirty = {}
+        self._save_locks = weakref.WeakValueDictionary()  # user_id -> asyncio.Lock, one direct save per user at a time
+
+    def _new_profile(self, user_id) -> UserProfile:
+        return UserProfile(user_id, self.catalog.embed_dim, self.catalog.n_colors)
+
+    def _remember(self, profile: UserProfile):
+        self._cache[profile.user_id] = profile
+        self._cache.move_to_end(profile.user_id)
+        while len(self._cache) > self.capacity:
+            self._cache.popitem(last=False)
+
+    async def get(self, user_id: str) -> UserProfile:
+        profile = self._cache.get(user_id)
+        if profile is not None:
+            self._cache.move_to_end(user_id)
+            return profile
+        profile = self._dirty.get(user_id)
+        if profile is not None:
+            self._remember(profile)
+            return profile
+
+        async with self.session_factory() as session:
+            record = await session.get(UserProfileDB, user_id)
+            if record is not None:
+                profile = UserProfile.from_db(record, self.catalog.embed_dim, self.catalog.n_colors)
+            else:
+                result = await session.execute(
+                    select(UserInteractionDB.artwork_id, UserInteractionDB.action).where(UserInteractionDB.user_id == user_id)
+                )
+                profile = self._new_profile(user_id)
+                snapshot = self.catalog.snapshot()
+                for artwork_id, action in result.all():
+                    profile.record(artwork_id, action, snapshot)
+        if record is None:
+            await self._persist(profile)
+
+        cached = self._cache.get(user_id)
+        if cached is not None:
+            # another request loaded the same user while we were waiting on the DB
+            return cached
+        self._remember(profile)
+        return profile
+
+    async def record(self, user_id: str, artwork_id: str, action: str) -> UserProfile:
+        profile = await self.get(user_id)
+        if profile.record(artwork_id, action, self.catalog.snapshot()):
+            await self._persist(profile)
+        return profile
+
+    async def _persist(self, profile: UserProfile):
+        if self.write_behind:
+            self._dirty[profile.user_id] = profile
+            return
+        lock = self._save_locks.get(profile.user_id)
+        if lock is None:
+            lock = self._save_locks[profile.user_id] = asyncio.Lock()
+        async with lock:
+            # a concurrent request's save may already have written our click
+            await self.save([profile])
+
+    @property
+    def has_dirty(self) -> bool:
+        return bool(self._dirty)
+
+    async def flush_dirty(self, batch_size: int = Config.profile_save_batch_size):
+        dirty, self._dirty = self._dirty, {}
+        if not dirty:
+            return
+        try:
+            await self.save(list(dirty.values()), batch_size=batch_size)
+        except Exception:
+            # keep them dirty (newer changes win) so the next flush retries
+            self._dirty = {**dirty, **self._dirty}
+            raise
+
+    async def _write(self, session, profiles: list) -> list:
+        """One statement for a batch of new or of stored profiles. Returns (profile, clicks) for the rows written."""
+        clicks = {profile.user_id: list(profile.unsaved) for profile in profiles}
+        if profiles[0].version == 0:
+            stmt = pg_insert(UserProfileDB).values([profile.to_db_values() for profile in profiles])
+            stmt = stmt.on_conflict_do_nothing(index_elements=[UserProfileDB.user_id]).returning(UserProfileDB.user_id)
+        else:
+            changes = [profile.to_db_changes() for profile in profiles]
+            names = list(changes[0])
+            rows = values(*(column(name, CHANGE_TYPES[name]) for name in names), name="changes").data(
+                [tuple(change[name] for name in names) for change in changes]
+            )
+            stmt = (
+                update(UserProfileDB)
+                .where(UserProfileDB.user_id == rows.c.user_id, UserProfileDB.version == rows.c.version)
+                .values(
+                    version=UserProfileDB.version + 1,
+                    liked_ids=func.array_cat(UserProfileDB.liked_ids, rows.c.liked_new_ids),
+                    disliked_ids=func.array_cat(UserProfileDB.disliked_ids, rows.c.disliked_new_ids),
+                    **{name: rows.c[name] for name in names if name.endswith(("_count", "_sum"))}
+                )
+                .returning(UserProfileDB.user_id)
+            )
+        written = {row[0] for row in (await session.execute(stmt)).all()}
+        return [(profile, clicks[profile.user_id]) for profile in profiles if profile.user_id in written]
+
+    async def save(self, profiles: list, batch_size: int = Config.profile_save_batch_size):
+        """
+        Version-checked multi-row writes of at most batch_size profiles (in one transaction per
+        attempt). Profiles that lost the version check are re-read, rebased and written again.
+        """
+        pending = [profile for profile in profiles if profile.version == 0 or profile.unsaved]
+        for attempt in range(Config.profile_save_attempts):
+            if not pending:
+                return
+            if attempt:
+                await asyncio.sleep(backoff_delay(attempt, base=0.01, cap=0.5))
+            written = []
+            async with self.session_factory() as session:
+                for group in ([p for p in pending if p.version == 0], [p for p in pending if p.version > 0]):
+                    for start in range(0, len(group), batch_size):
+                        written += await self._write(session, group[start:start + batch_size])
+                await session.commit()
+            for profile, clicks in written:
+                profile.mark_saved(clicks)
+            done = {profile.user_id for profile, _ in written}
+            pending = [profile for profile in pending if profile.user_id not in done]
+            if pending:
+                async with self.session_factory() as session:
+                    result = await session.execute(select(UserProfileDB).where(UserProfileDB.user_id.in_([p.user_id for p in pending])))
+                    records = {record.user_id: record for record in result.scalars().all()}
+                snapshot = self.catalog.snapshot()
+                for profile in pending:
+                    profile.rebase(records.get(profile.user_id), snapshot)
+        if pending:
+            raise ProfileConflictError(f"{len(pending)} profiles still conflicting after {Config.profile_save_attempts} attempts")
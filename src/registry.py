@@ -0,0 +1,57 @@
+import time
+import hashlib
+import numpy as np
+import torch
+from PIL import Image
+
+from src.config import Config
+from src.classifiers_api import ClassifiersApi
+from src.cpu_inference import set_torch_threads
+from train.train_walls_art import load_model
+from utils.embed_model import ClipEmbed
+
+
+class ModelRegistry:
+    """
+    Holds the single shared instance of every model the service uses: CLIP, the three
+    abstract/noisy/paint regressors and the wall-art MLP. load() is idempotent, so
+    every consumer can call it and still get the same instances.
+    """
+
+    def __init__(self, walls_model_path: str = Config.walls_model_path):
+        self.walls_model_path = walls_model_path
+        self.clip = None
+        self.classifiers = None
+        self.wall_model = None
+        self.wall_model_version = None
+        self.loaded = False
+        self.warm = False
+
+    def load(self):
+        if self.loaded:
+            return self
+        start = time.perf_counter()
+        set_torch_threads()
+        self.clip = ClipEmbed()
+        self.classifiers = ClassifiersApi()
+        self.wall_model = load_model(input_dim=2 * self.clip.dim, path=self.walls_model_path)
+        self.wall_model.eval()
+        with open(self.walls_model_path, "rb") as f:
+            self.wall_model_version = hashlib.sha1(f.read()).hexdigest()[:12]
+        self.loaded = True
+        print(f"Models loaded in {time.perf_counter() - start:.1f}s")
+        return self
+
+    def warm_up(self):
+        """One dummy inference per model, so the first real request doesn't pay for lazy init."""
+        self.load()
+        start = time.perf_counter()
+        embedding = self.clip.predict_images([Image.new("RGB", (336, 336))])[0]
+        self.classifiers.predict_from_embedding(embedding)
+        with torch.no_grad():
+            self.wall_model(torch.from_numpy(np.concatenate([embedding, embedding])).unsqueeze(0))
+        self.warm = True
+        print(f"Models warmed up in {time.perf_counter() - start:.1f}s")
+
+
+model_registry = ModelRegistry()
@@ -0,0 +1,141 @@
+import asyncio
+import random
+import socket
+import time
+
+import aiohttp
+import asyncpg
+from sqlalchemy import exc as sa_exc
+
+from src.config import Config
+
+# Errors worth retrying: the DB (or the network to it) is briefly unavailable, or the
+# transaction lost a race. Everything else (integrity errors, bad SQL, bugs) fails at once.
+RETRYABLE_ERRORS = (
+    ConnectionError,
+    TimeoutError,
+    asyncio.TimeoutError,
+    socket.gaierror,  # DNS hiccup
+    aiohttp.ClientConnectionError,
+    sa_exc.TimeoutError,  # pool checkout timed out
+    asyncpg.PostgresConnectionError,
+    asyncpg.InterfaceError,
+    asyncpg.CannotConnectNowError,
+    asyncpg.TooManyConnectionsError,
+    asyncpg.SerializationError,
+    asyncpg.DeadlockDetectedError,
+)
+
+
+class CircuitOpenError(Exception):
+    """Raised without touching the backend while its circuit breaker is open."""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} unavailable, retry in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+def is_retryable(error: BaseException) -> bool:
+    if isinstance(error, sa_exc.DBAPIError) and error.connection_invalidated:
+        return True
+    # SQLAlchemy wraps the driver error; look at the whole cause chain
+    while error is not None:
+        if isinstance(error, RETRYABLE_ERRORS):
+            return True
+        if isinstance(error, aiohttp.ClientResponseError) and (error.status >= 500 or error.status == 429):
+            return True
+        error = getattr(error, "orig", None) or error.__cause__
+    return False
+
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive retryable failures; while open every call
+    fails fast with CircuitOpenError. After reset_seconds a single trial call is let
+    through (half-open): success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = Config.breaker_failure_threshold,
+                 reset_seconds: float = Config.breaker_reset_seconds):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def before_call(self):
+        state = self.state
+        if state == "open" or (state == "half_open" and self._trial_running):
+            retry_after = max(self.reset_seconds - (time.monotonic() - self.opened_at), 0)
+            raise CircuitOpenError(self.name, retry_after)
+        if state == "half_open":
+            self._trial_running = True
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_running = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                print(f"Circuit '{self.name}' opened after {self.failures} failures")
+            self.opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        return dict(name=self.name, state=self.state, consecutive_failures=self.failures)
+
+
+def backoff_delay(attempt: int, base: float = Config.retry_base_delay_seconds, cap: float = Config.retry_max_delay_seconds) -> float:
+    """Full jitter: uniform in [0, min(cap, base * 2**attempt)]."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+async def retry(fn, *, name: str = "operation", attempts: int = Config.retry_max_attempts,
+                base_delay: float = Config.retry_base_delay_seconds, max_delay: float = Config.retry_max_delay_seconds,
+                breaker: CircuitBreaker = None):
+    """
+    Await fn() (a zero-argument coroutine function) up to `attempts` times, sleeping with
+    exponential backoff and jitter between retryable failures. Non-retryable errors and the
+    last retryable error are raised to the caller.
+    """
+    for attempt in range(attempts):
+        if breaker is not None:
+            breaker.before_call()
+        try:
+            result = await fn()
+        except Exception as e:
+            if not is_retryable(e):
+                if breaker is not None:
+                    breaker.record_success()  # the backend answered
+                raise
+            if breaker is not None:
+                breaker.record_failure()
+            if attempt == attempts - 1:
+                raise
+            delay = backoff_delay(attempt, base_delay, max_delay)
+            print(f"{name} failed: {e}, retrying in {delay:.2f}s ({attempt + 1}/{attempts})...")
+            await asyncio.sleep(delay)
+        else:
+            if breaker is not None:
+                breaker.record_success()
+            return result
+
+
+db_breaker = CircuitBreaker("database")
+
+
+async def db_retry(fn, name: str = "DB operation"):
+    """retry() for request-path database work, guarded by the shared database circuit breaker."""
+    return await retry(fn, name=name, breaker=db_breaker)
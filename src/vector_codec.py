@@ -0,0 +1,26 @@
+import numpy as np
+
+# Binary vector columns hold little-endian float32 bytes (4 * dim bytes per row).
+VECTOR_DTYPE = np.dtype("<f4")
+
+
+def encode_vector(vector) -> bytes:
+    return np.asarray(vector, dtype=VECTOR_DTYPE).tobytes()
+
+
+def decode_vectors(binary_values, json_values, dim: int) -> np.ndarray:
+    """
+    Decode one vector column into an (N, dim) float32 matrix.
+    Rows with a binary value are decoded with a single np.frombuffer over the joined bytes;
+    rows not yet migrated fall back to their JSON value. Rows with neither become NaN.
+    """
+    binary_values = list(binary_values)
+    if binary_values and all(value is not None for value in binary_values):
+        return np.frombuffer(b"".join(binary_values), dtype=VECTOR_DTYPE).reshape(-1, dim).astype(np.float32)
+    matrix = np.full((len(binary_values), dim), np.nan, dtype=np.float32)
+    for row, (binary, json_value) in enumerate(zip(binary_values, json_values)):
+        if binary is not None:
+            matrix[row] = np.frombuffer(binary, dtype=VECTOR_DTYPE)
+        elif json_value is not None:
+            matrix[row] = json_value
+    return matrix
@@ -1,38 +1,202 @@
+import os
 import torch
 import numpy as np
 
 from src.config import Config
+from src.cpu_inference import optimize_for_cpu
 from train.train_walls_art import load_model
-from utils.get_walls_artwork_pairs import load_embeddings
+from src.embedding_store import open_store
 from utils.embed_model import ClipEmbed
 
+
+def top_k_indexes(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indexes of the k highest scores, best first, without a full sort."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top], kind="stable")]
+
+
+class WallArtScorer:
+    """
+    WallArtClassifier with its first Linear(1536, 64) split into a wall half and an art half.
+    The art half is cached for every catalog artwork (N x 64), so ranking a wall costs one
+    768 x 64 product plus add-ReLU-MLP over 64-d rows. Registered as a Catalog listener.
+    """
+
+    def __init__(self, model, embed_dim=768, inference_mode=Config.wall_cpu_inference_mode):
+        first_layer = model.model[0]
+        weight = first_layer.weight.detach()
+        self.embed_dim = embed_dim
+        self.wall_weight = weight[:, :embed_dim].T.contiguous()
+        self.art_weight = weight[:, embed_dim:].T.contiguous()
+        self.bias = first_layer.bias.detach().clone()
+        self.head = optimize_for_cpu(model.model[1:], inference_mode)
+        self.head.eval()
+        self._state = (np.empty(0, dtype=object), torch.empty((0, self.wall_weight.shape[1])))
+
+    @property
+    def ids(self) -> np.ndarray:
+        return self._state[0]
+
+    def project_arts(self, art_embeddings) -> torch.Tensor:
+        art_tensor = torch.from_numpy(np.ascontiguousarray(art_embeddings, dtype=np.float32)).reshape(-1, self.embed_dim)
+        with torch.no_grad():
+            return art_tensor @ self.art_weight
+
+    def set_arts(self, art_ids, art_embeddings):
+        self._state = (np.asarray(art_ids, dtype=object), self.project_arts(art_embeddings))
+
+    def on_catalog_reset(self, snapshot):
+        self.set_arts(snapshot.ids, snapshot.embeddings)
+
+    def on_catalog_added(self, snapshot, artwork_ids):
+        ids, projections = self._state
+        keep = ~np.isin(ids, artwork_ids)
+        added = snapshot.rows_of(artwork_ids)
+        self._state = (
+            np.concatenate([ids[keep], snapshot.ids[added]]),
+            torch.cat([projections[torch.from_numpy(keep)], self.project_arts(snapshot.embeddings[added])])
+        )
+
+    def on_catalog_removed(self, snapshot, artwork_ids):
+        ids, projections = self._state
+        keep = ~np.isin(ids, artwork_ids)
+        self._state = (ids[keep], projections[torch.from_numpy(keep)])
+
+    def score(self, wall_embedding):
+        """Returns (ids, scores) for every cached artwork."""
+        ids, projections = self._state
+        wall_tensor = torch.as_tensor(np.array(wall_embedding, dtype=np.float32)).reshape(1, -1)
+        with torch.no_grad():
+            wall_projection = wall_tensor @ self.wall_weight + self.bias
+            scores = self.head(projections + wall_projection).squeeze(1)
+        return ids, scores.numpy()
+
+    def rank(self, wall_embedding, k=30):
+        ids, scores = self.score(wall_embedding)
+        top_k = top_k_indexes(scores, k)
+        return [str(id) for id in ids[top_k]], scores[top_k].tolist()
+
+
+def wall_id_from_path(wall_path: str):
+    """Known walls are served as {Config.walls_url}{wall_id + 1}.jpg; anything else returns None."""
+    if not wall_path.startswith(Config.walls_url):
+        return None
+    stem, _ = os.path.splitext(wall_path[len(Config.walls_url):])
+    return int(stem) - 1 if stem.isdigit() and int(stem) > 0 else None
+
+
+def load_wall_embeddings(path=Config.wall_embeddings_path) -> dict:
+    return open_store(path).as_dict()
+
+
+class WallRecommendationCache:
+    """
+    Top-k artworks of every known wall, precomputed from a walls x catalog score matrix and
+    keyed by (model_version, wall_id), so a known wall is served without CLIP or a catalog scan.
+    Registered as a Catalog listener: adding or deleting artworks only scores / drops those
+    columns, and a wall's top-k is re-selected from its row only when the change touches it.
+    """
+
+    def __init__(self, scorer: WallArtScorer, wall_embeddings: dict, model_version: str, k=Config.wall_cache_top_k):
+        self.scorer = scorer
+        self.model_version = model_version
+        self.k = k
+        self.wall_ids = list(wall_embeddings)
+        walls = np.stack([np.asarray(wall_embeddings[wall_id], dtype=np.float32) for wall_id in self.wall_ids]) \
+            if self.wall_ids else np.empty((0, scorer.embed_dim), dtype=np.float32)
+        with torch.no_grad():
+            self.wall_projections = torch.from_numpy(walls) @ scorer.wall_weight + scorer.bias
+        # (art ids, walls x arts scores, {(model_version, wall_id): (top ids, top scores)})
+        self._state = (np.empty(0, dtype=object), np.empty((len(self.wall_ids), 0), dtype=np.float32), {})
+
+    def __len__(self):
+        return len(self._state[2])
+
+    def score_columns(self, art_embeddings, chunk_size=Config.walls_chunk_size) -> np.ndarray:
+        """Scores of every known wall against the given artworks, (n_walls, n_arts)."""
+        projections = self.scorer.project_arts(art_embeddings)
+        scores = torch.empty((len(self.wall_ids), len(projections)), dtype=torch.float32)
+        with torch.no_grad():
+            for start in range(0, len(projections), chunk_size):
+                chunk = projections[start:start + chunk_size]
+                hidden = self.wall_projections[:, None, :] + chunk[None, :, :]
+                scores[:, start:start + len(chunk)] = self.scorer.head(hidden).squeeze(-1)
+        return scores.numpy()
+
+    def _select(self, ids, row_scores) -> tuple:
+        top_k = top_k_indexes(row_scores, self.k)
+        return [str(id) for id in ids[top_k]], row_scores[top_k].tolist()
+
+    def _reselect(self, ids, scores, top, walls):
+        top = dict(top)
+        for row in walls:
+            top[(self.model_version, self.wall_ids[row])] = self._select(ids, scores[row])
+        return top
+
+    def precompute(self, art_ids, art_embeddings):
+        ids = np.asarray(art_ids, dtype=object)
+        scores = self.score_columns(art_embeddings)
+        self._state = (ids, scores, self._reselect(ids, scores, {}, range(len(self.wall_ids))))
+        print(f"Wall recommendations precomputed for {len(self.wall_ids)} walls x {len(ids)} artworks")
+
+    def lookup(self, wall_id, k: int):
+        """Cached (ids, scores) of a known wall, or None when the wall (or this many results) isn't cached."""
+        if k > self.k:
+            return None
+        cached = self._state[2].get((self.model_version, wall_id))
+        if cached is None:
+            return None
+        return cached[0][:k], cached[1][:k]
+
+    def on_catalog_reset(self, snapshot):
+        self.precompute(snapshot.ids, snapshot.embeddings)
+
+    def on_catalog_added(self, snapshot, artwork_ids):
+        ids, scores, top = self._state
+        keep = ~np.isin(ids, artwork_ids)
+        added = snapshot.rows_of(artwork_ids)
+        new_scores = self.score_columns(snapshot.embeddings[added])
+        replaced = set(map(str, ids[~keep]))
+        ids = np.concatenate([ids[keep], snapshot.ids[added]])
+        scores = np.hstack([scores[:, keep], new_scores])
+
+        changed = []
+        for row, wall_id in enumerate(self.wall_ids):
+            top_ids, top_scores = top[(self.model_version, wall_id)]
+            beats_top = len(top_ids) < self.k or (new_scores.shape[1] and new_scores[row].max() > top_scores[-1])
+            if beats_top or replaced.intersection(top_ids):
+                changed.append(row)
+        self._state = (ids, scores, self._reselect(ids, scores, top, changed))
+
+    def on_catalog_removed(self, snapshot, artwork_ids):
+        ids, scores, top = self._state
+        keep = ~np.isin(ids, artwork_ids)
+        removed = set(map(str, ids[~keep]))
+        ids, scores = ids[keep], scores[:, keep]
+        changed = [
+            row for row, wall_id in enumerate(self.wall_ids)
+            if removed.intersection(top[(self.model_version, wall_id)][0])
+        ]
+        self._state = (ids, scores, self._reselect(ids, scores, top, changed))
+
+
 class PredictionWalls:
     def __init__(self, model_path=Config.walls_model_path):
         self.model = load_model(input_dim=1536, path=model_path)
         self.model.eval()
         self.clip = ClipEmbed()
-        wall_embeddings, art_embeddings = load_embeddings(
-            wall_path="embeddings_cache/wall_embeddings.pkl",
-            art_path="embeddings_cache/art_embeddings.pkl"
-        )
-        self.image_embeddings = art_embeddings
-        self.wall_embeddings = wall_embeddings
+        art_store = open_store(Config.art_embeddings_path)
+        self.image_embeddings = art_store.as_dict()
+        self.wall_embeddings = load_wall_embeddings()
+        self.scorer = WallArtScorer(self.model)
+        self.scorer.set_arts(art_store.ids, art_store.matrix())
 
     def predict(self, wall_path, k=30):
         wall_embedding = self.clip.predict_imgs([wall_path])[0]
-        wall_tensor = torch.tensor(wall_embedding, dtype=torch.float32).unsqueeze(0)
-
-        scores = {}
-        with torch.no_grad():
-            for art_id, feature in self.image_embeddings.items():
-                art_embedding = feature
-                art_tensor = torch.tensor(art_embedding, dtype=torch.float32).unsqueeze(0)
-                input_tensor = torch.cat((wall_tensor, art_tensor), dim=1)
-                score = self.model(input_tensor).item()
-                scores[art_id] = score
 
         # Get top-k recommendations
-        top_k = sorted(scores.items(), key=lambda x: x[1], reverse=True)[:k]
-        top_k_ids, top_k_scores = zip(*top_k)
-        top_k_str = [str(id) for id in top_k_ids]
-        return top_k_str, top_k_scores
\ No newline at end of file
+        top_k_str, top_k_scores = self.scorer.rank(wall_embedding, k=k)
+        return top_k_str, tuple(top_k_scores)
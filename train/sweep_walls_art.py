@@ -0,0 +1,139 @@
+"""
+Hyperparameter sweep for WallArtClassifier: every (lr, dropout, batch size, weight decay)
+x seed x wall-grouped fold is trained in parallel across CPU cores with early stopping
+on the validation loss. Writes one row per run plus a per-config summary, then retrains
+the best config on all walls and exports its checkpoint.
+
+    python train/sweep_walls_art.py --lr 0.001 0.005 --dropout 0.3 0.5 --seeds 0 1 2 --folds 5
+"""
+import os
+import sys
+import csv
+import time
+import argparse
+import itertools
+import numpy as np
+import torch
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from sklearn.model_selection import GroupKFold
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from train.train_walls_art import WallArtClassifier, PairBatches, train_model, save_model
+from utils.get_walls_artwork_pairs import load_pair_index, PairIndex
+from src.embedding_store import open_store
+from src.config import Config
+
+HYPERPARAMETERS = ("lr", "dropout", "batch_size", "weight_decay")
+
+_pairs = None  # per-worker PairIndex over the memory-mapped stores
+
+
+def init_worker(wall_rows, art_rows, labels, wall_path, art_path):
+    global _pairs
+    torch.set_num_threads(1)  # parallelism comes from the processes
+    _pairs = PairIndex(wall_rows, art_rows, labels, open_store(wall_path).matrix(), open_store(art_path).matrix())
+
+
+def fit(pairs: PairIndex, train_positions, val_positions, config: dict, seed: int, epochs: int, patience):
+    """Without validation positions (the final refit) it trains for exactly `epochs`."""
+    torch.manual_seed(seed)
+    model = WallArtClassifier(input_dim=pairs.input_dim, dropout_rate=config["dropout"])
+    train_loader = PairBatches(pairs.subset(train_positions), batch_size=config["batch_size"], shuffle=True, seed=seed)
+    has_val = len(val_positions) > 0
+    val_loader = PairBatches(pairs.subset(val_positions), batch_size=config["batch_size"]) if has_val else train_loader
+    return train_model(
+        model, train_loader, val_loader, epochs=epochs, lr=config["lr"], weight_decay=config["weight_decay"],
+        patience=patience if has_val else None, verbose=False
+    )
+
+
+def run_trial(config: dict, seed: int, fold: int, train_positions, val_positions, epochs: int, patience: int) -> dict:
+    start = time.perf_counter()
+    _, train_losses, val_losses = fit(_pairs, train_positions, val_positions, config, seed, epochs, patience)
+    best_epoch = int(np.argmin(val_losses))
+    return dict(
+        **config, seed=seed, fold=fold,
+        best_epoch=best_epoch + 1, epochs_run=len(val_losses),
+        train_loss=train_losses[best_epoch], val_loss=val_losses[best_epoch],
+        seconds=round(time.perf_counter() - start, 2)
+    )
+
+
+def summarize(results: list) -> list:
+    groups = {}
+    for result in results:
+        groups.setdefault(tuple(result[name] for name in HYPERPARAMETERS), []).append(result)
+    summary = []
+    for key, runs in groups.items():
+        val_losses = np.array([run["val_loss"] for run in runs])
+        summary.append(dict(
+            zip(HYPERPARAMETERS, key),
+            runs=len(runs),
+            val_loss_mean=float(val_losses.mean()),
+            val_loss_std=float(val_losses.std()),
+            best_epoch_mean=float(np.mean([run["best_epoch"] for run in runs]))
+        ))
+    return sorted(summary, key=lambda row: row["val_loss_mean"])
+
+
+def write_csv(path, rows: list):
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lr", type=float, nargs="+", default=[1e-3, 5e-3])
+    parser.add_argument("--dropout", type=float, nargs="+", default=[0.3, 0.5])
+    parser.add_argument("--batch-size", type=int, nargs="+", default=[32, 64])
+    parser.add_argument("--weight-decay", type=float, nargs="+", default=[0.0, 1e-4])
+    parser.add_argument("--seeds", type=int, nargs="+", default=[0, 1])
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--epochs", type=int, default=100)
+    parser.add_argument("--patience", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--results", default="sweep_results.csv")
+    parser.add_argument("--summary", default="sweep_summary.csv")
+    parser.add_argument("--output", default="wall_art_model_sweep.pt", help="checkpoint of the best config, retrained on all walls")
+    args = parser.parse_args()
+
+    pairs = load_pair_index(seed=0)
+    folds = list(GroupKFold(n_splits=args.folds).split(pairs.labels, pairs.labels, groups=pairs.wall_rows))
+    configs = [dict(zip(HYPERPARAMETERS, values)) for values in itertools.product(args.lr, args.dropout, args.batch_size, args.weight_decay)]
+    print(f"{len(configs)} configs x {len(args.seeds)} seeds x {args.folds} folds on {args.workers} workers, {len(pairs)} pairs")
+
+    results = []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(
+        max_workers=args.workers,
+        initializer=init_worker,
+        initargs=(pairs.wall_rows, pairs.art_rows, pairs.labels, Config.wall_embeddings_path, Config.art_embeddings_path)
+    ) as pool:
+        futures = [
+            pool.submit(run_trial, config, seed, fold, train_positions, val_positions, args.epochs, args.patience)
+            for config in configs for seed in args.seeds for fold, (train_positions, val_positions) in enumerate(folds)
+        ]
+        for done, future in enumerate(as_completed(futures), 1):
+            results.append(future.result())
+            if done % max(1, len(futures) // 20) == 0 or done == len(futures):
+                print(f"{done}/{len(futures)} runs, {time.perf_counter() - start:.0f}s")
+
+    summary = summarize(results)
+    write_csv(args.results, results)
+    write_csv(args.summary, summary)
+    for row in summary[:5]:
+        print(row)
+
+    best = summary[0]
+    config = {name: best[name] for name in HYPERPARAMETERS}
+    epochs = max(1, int(round(best["best_epoch_mean"])))
+    print(f"Retraining best config {config} on all walls for {epochs} epochs")
+    model, _, _ = fit(pairs, np.arange(len(pairs)), np.empty(0, dtype=np.int64), config, args.seeds[0], epochs, None)
+    save_model(model, args.output)
+    print(f"Saved {args.output}; results in {args.results}, summary in {args.summary}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,57 +1,49 @@
 import numpy as np
 import torch
 import torch.nn as nn
-from torch.utils.data import TensorDataset, DataLoader, random_split
 from sklearn.model_selection import train_test_split
 
 import os
 import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from utils.get_walls_artwork_pairs import create_embedding_pairs_from_files
-
-# 2. Prepare training data: concatenate embeddings and collect labels
-def prepare_dataset(embeddings_pairs, labels):
-    X = []
-    y = []
-    for key, (wall_emb, art_emb) in embeddings_pairs.items():
-        if key in labels:
-            combined = np.concatenate([wall_emb, art_emb])  # shape: (2 * embedding_dim,)
-            X.append(combined)
-            y.append(labels[key])
-    return np.array(X), np.array(y)
-
-def split_dataset_by_wall(X, y, pairs, val_ratio=0.25, seed=42):
+from utils.get_walls_artwork_pairs import load_pair_index, PairIndex
+from src.config import Config
+
+# 2. Prepare training data: index pairs, features gathered per batch
+class PairBatches:
+    """Iterates (X_batch, y_batch) tensors over a PairIndex, gathering the [wall | art] rows of each batch only."""
+
+    def __init__(self, pairs: PairIndex, batch_size=64, shuffle=False, seed=None):
+        self.pairs = pairs
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.rng = np.random.default_rng(seed)
+
+    def __len__(self):
+        return (len(self.pairs) + self.batch_size - 1) // self.batch_size
+
+    def __iter__(self):
+        order = self.rng.permutation(len(self.pairs)) if self.shuffle else np.arange(len(self.pairs))
+        for start in range(0, len(order), self.batch_size):
+            positions = order[start:start + self.batch_size]
+            yield (
+                torch.from_numpy(self.pairs.features(positions)),
+                torch.from_numpy(self.pairs.labels[positions]).unsqueeze(1)
+            )
+
+def split_dataset_by_wall(pairs: PairIndex, val_ratio=0.25, seed=42):
     """
     Split dataset so that no wall ID appears in both train and validation.
-    
-    Args:
-        X: np.array, features
-        y: np.array, labels
-        pairs: list of (wall_id, art_id) in the same order as X, y
-        val_ratio: fraction of walls to put in validation
+    val_ratio: fraction of walls to put in validation
     """
     rng = np.random.RandomState(seed)
 
-    # Collect unique wall IDs
-    walls = list({wall for wall, _ in pairs})
+    walls = np.unique(pairs.wall_rows)
     rng.shuffle(walls)
 
     n_val = int(len(walls) * val_ratio)
-    val_walls = set(walls[:n_val])
-    train_walls = set(walls[n_val:])
-
-    # Split based on wall membership
-    train_idx, val_idx = [], []
-    for i, (wall, art) in enumerate(pairs):
-        if wall in train_walls:
-            train_idx.append(i)
-        else:
-            val_idx.append(i)
-
-    X_train, y_train = X[train_idx], y[train_idx]
-    X_val, y_val = X[val_idx], y[val_idx]
-
-    return (X_train, y_train), (X_val, y_val)
+    in_val = np.isin(pairs.wall_rows, walls[:n_val])
+    return pairs.subset(np.flatnonzero(~in_val)), pairs.subset(np.flatnonzero(in_val))
 
 
 def split_dataset(X, y, val_ratio=0.25, seed=42):
@@ -77,12 +69,17 @@ class WallArtClassifier(nn.Module):
         return self.model(x)
 
 # 4. Train the model
-def train_model(model, train_loader, val_loader, epochs=10, lr=1e-3, weight_decay=1e-5):
+def train_model(model, train_loader, val_loader, epochs=10, lr=1e-3, weight_decay=1e-5, patience=None, verbose=True):
+    """
+    With patience, stops once the validation loss hasn't improved for `patience` epochs
+    and restores the weights of the best epoch.
+    """
     criterion = nn.BCELoss()
-    optimizer = torch.optim.Adam(model.parameters(), lr=lr)
+    optimizer = torch.optim.Adam(model.parameters(), lr=lr, weight_decay=weight_decay)
 
     train_losses = []
     val_losses = []
+    best_loss, best_state, bad_epochs = float("inf"), None, 0
 
     for epoch in range(epochs):
         model.train()
@@ -97,10 +94,22 @@ def train_model(model, train_loader, val_loader, epochs=10, lr=1e-3, weight_deca
         avg_loss = total_loss / len(train_loader)
 
         val_loss = evaluate_model(model, val_loader)
-        print(f"Epoch {epoch+1}: Train Loss = {avg_loss:.4f} | Val Loss = {val_loss:.4f}")
+        if verbose:
+            print(f"Epoch {epoch+1}: Train Loss = {avg_loss:.4f} | Val Loss = {val_loss:.4f}")
         train_losses.append(avg_loss)
         val_losses.append(val_loss)
 
+        if patience is not None:
+            if val_loss < best_loss:
+                best_loss, bad_epochs = val_loss, 0
+                best_state = {key: value.clone() for key, value in model.state_dict().items()}
+            else:
+                bad_epochs += 1
+                if bad_epochs >= patience:
+                    break
+
+    if best_state is not None:
+        model.load_state_dict(best_state)
     return model, train_losses, val_losses
 
 def evaluate_model(model, loader):
@@ -126,29 +135,17 @@ def load_model(input_dim, path="wall_art_model.pt"):
     return model    
 
 def main():
-    embeddings_pairs, labels = create_embedding_pairs_from_files(
-        wall_path="embeddings_cache/wall_embeddings.pkl",
-        art_path="embeddings_cache/art_embeddings.pkl"
+    pairs = load_pair_index(
+        wall_path=Config.wall_embeddings_path,
+        art_path=Config.art_embeddings_path
     )
-    X, y = prepare_dataset(embeddings_pairs, labels)
-    pairs_list = list(embeddings_pairs.keys())  # "wall,art" strings
-    pairs = [(int(p.split(",")[0]), p.split(",")[1]) for p in pairs_list]
-
-    (X_train, y_train), (X_val, y_val) = split_dataset_by_wall(X, y, pairs)
-
-    # Convert to tensors
-    train_loader = DataLoader(TensorDataset(
-        torch.tensor(X_train, dtype=torch.float32),
-        torch.tensor(y_train, dtype=torch.float32).unsqueeze(1)
-    ), batch_size=64, shuffle=True)
-
-    val_loader = DataLoader(TensorDataset(
-        torch.tensor(X_val, dtype=torch.float32),
-        torch.tensor(y_val, dtype=torch.float32).unsqueeze(1)
-    ), batch_size=64)
+    train_pairs, val_pairs = split_dataset_by_wall(pairs)
+
+    train_loader = PairBatches(train_pairs, batch_size=64, shuffle=True)
+    val_loader = PairBatches(val_pairs, batch_size=64)
     
-    model = WallArtClassifier(input_dim=X.shape[1], dropout_rate=0.5)
-    print(f"input_dim: {X.shape[1]}")
+    model = WallArtClassifier(input_dim=pairs.input_dim, dropout_rate=0.5)
+    print(f"input_dim: {pairs.input_dim}")
     trained_model, train_losses, val_losses = train_model(
         model, train_loader, val_loader, epochs=10, lr=0.005, weight_decay=0.0001
     )
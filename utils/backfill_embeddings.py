@@ -0,0 +1,259 @@
+"""
+Parallel, resumable embedding backfill.
+
+    python utils/backfill_embeddings.py stores              # wall / art CLIP stores used for training
+    python utils/backfill_embeddings.py artworks            # re-featurize the artworks table (after a model change)
+    python utils/backfill_embeddings.py artworks --restart  # ... from the first artwork again
+    python utils/backfill_embeddings.py classifiers         # re-score abstract/noisy/paint from the stored embeddings
+
+Images are downloaded concurrently (Config.fetch_max_concurrency) and embedded in CLIP
+batches. Progress is checkpointed every --checkpoint-every items: store rows are appended
+(the store itself is the checkpoint), artworks rows are committed together with the last
+artwork_id done. Ids that still fail after a few retries go to a .failed.jsonl file and
+are skipped on later runs unless --retry-failed is given.
+"""
+import os
+import sys
+import json
+import asyncio
+import argparse
+import numpy as np
+from tqdm import tqdm
+from sqlalchemy import select, update
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.config import Config
+from src.ingest import ImageFetcher
+from src.executors import run_inference
+from src.resilience import retry
+
+
+def load_failed(path) -> dict:
+    failed = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    failed[record["id"]] = record
+    return failed
+
+
+def record_failures(path, failures: list):
+    if failures:
+        with open(path, "a") as f:
+            f.writelines(json.dumps(record) + "\n" for record in failures)
+
+
+async def fetch_all(fetcher: ImageFetcher, urls: list) -> list:
+    """One image or exception per url; transient errors are retried with backoff."""
+    async def fetch(url):
+        return await retry(lambda: fetcher.fetch_image(url), name=f"Fetching {url}", attempts=3)
+    return await asyncio.gather(*(fetch(url) for url in urls), return_exceptions=True)
+
+
+async def backfill_store(store, items: list, clip, fetcher: ImageFetcher, batch_size=16,
+                         checkpoint_every=Config.backfill_checkpoint_every, retry_failed=False, desc="Embedding"):
+    """
+    items: (id, url) pairs; ids already in the store are skipped, so an interrupted run
+    resumes where its last checkpoint left off.
+    """
+    failed_path = store.path + ".failed.jsonl"
+    failed = {} if retry_failed else load_failed(failed_path)
+    todo = [(key, url) for key, url in items if key not in store and key not in failed]
+    if not todo:
+        return 0
+
+    done = 0
+    with tqdm(total=len(todo), desc=desc) as progress:
+        for start in range(0, len(todo), checkpoint_every):
+            chunk = todo[start:start + checkpoint_every]
+            images = await fetch_all(fetcher, [url for _, url in chunk])
+            ok = [(key, image) for (key, _), image in zip(chunk, images) if not isinstance(image, Exception)]
+            failures = [
+                dict(id=key, url=url, error=repr(image))
+                for (key, url), image in zip(chunk, images) if isinstance(image, Exception)
+            ]
+            vectors = []
+            for batch_start in range(0, len(ok), batch_size):
+                batch = [image for _, image in ok[batch_start:batch_start + batch_size]]
+                vectors.append(await run_inference(clip.predict_images, batch))
+            if ok:
+                store.append([key for key, _ in ok], np.concatenate(vectors))  # checkpoint
+            record_failures(failed_path, failures)
+            done += len(ok)
+            progress.update(len(chunk))
+    print(f"{desc}: {done} embedded, {len(todo) - done} failed (see {failed_path})")
+    return done
+
+
+async def backfill_training_stores(wall_to_positive, wall_store, art_store, clip=None,
+                                   checkpoint_every=Config.backfill_checkpoint_every, retry_failed=False):
+    """Embed every wall and selected artwork that the stores don't have yet."""
+    if clip is None:
+        from utils.embed_model import ClipEmbed
+        clip = ClipEmbed()
+    fetcher = ImageFetcher()
+    try:
+        walls = [(wall_id, f"{Config.walls_url}{wall_id + 1}.jpg") for wall_id in wall_to_positive]
+        arts = [(art_id, f"{Config.images_url}{art_id}.jpg") for art_id in sorted(set().union(*wall_to_positive.values()))]
+        for store, items, desc in ((wall_store, walls, "Embedding walls"), (art_store, arts, "Embedding artworks")):
+            await backfill_store(store, items, clip, fetcher, checkpoint_every=checkpoint_every, retry_failed=retry_failed, desc=desc)
+    finally:
+        await fetcher.close()
+
+
+def artwork_from_row(record):
+    from models import Artwork
+    properties = record.properties or {}
+    return Artwork(
+        artwork_id=record.artwork_id,
+        artist_id=record.artist_id or "",
+        artist_name=record.artist_name or "",
+        artwork_name=record.artwork_name or "",
+        images=record.images or [],
+        description=record.description,
+        category=record.category,
+        **{key: properties.get(key) for key in ("media", "medium", "size", "price", "styles", "subject")}
+    )
+
+
+async def refeaturize_artworks(checkpoint_every=Config.backfill_checkpoint_every, state_path=Config.backfill_state_path,
+                               restart=False, retry_failed=False):
+    """Recompute embeddings, colors and classifier scores of every artwork, keyset-paginated by artwork_id."""
+    from db import get_connection, close_db
+    from models_db import ArtworkDB
+    from src.features import Features
+    from src.resilience import db_retry
+
+    failed_path = state_path + ".failed.jsonl"
+    failed = {} if retry_failed else load_failed(failed_path)
+    state = {}
+    if not restart and os.path.exists(state_path):
+        with open(state_path) as f:
+            state = json.load(f)
+    last_id = state.get("last_artwork_id")
+    if last_id is not None:
+        print(f"Resuming after artwork {last_id}")
+
+    features = Features()
+    vector_columns = ("embeddings", "colors") if Config.vector_storage == "json" else ("embeddings_bin", "colors_bin")
+    columns = (*vector_columns, "abstract", "noisy", "paint")
+    done = 0
+    try:
+        while True:
+            async def next_page():
+                async with get_connection() as session:
+                    stmt = select(ArtworkDB).order_by(ArtworkDB.artwork_id).limit(checkpoint_every)
+                    if last_id is not None:
+                        stmt = stmt.where(ArtworkDB.artwork_id > last_id)
+                    return (await session.execute(stmt)).scalars().all()
+
+            records = await db_retry(next_page, name="Reading artworks")
+            if not records:
+                break
+            page = [artwork_from_row(record) for record in records if record.artwork_id not in failed]
+            rows = await asyncio.gather(*(features.featurize(artwork) for artwork in page), return_exceptions=True)
+
+            updates, failures = [], []
+            for artwork, row in zip(page, rows):
+                if isinstance(row, Exception) or row is None:
+                    failures.append(dict(id=artwork.artwork_id, error=repr(row) if row is not None else "no image could be featurized"))
+                else:
+                    updates.append(dict(artwork_id=artwork.artwork_id, **{column: row[column] for column in columns}))
+
+            async def write_page():
+                async with get_connection() as session:
+                    if updates:
+                        await session.execute(update(ArtworkDB), updates)
+                    await session.commit()
+
+            await db_retry(write_page, name="Updating artworks")
+            last_id = records[-1].artwork_id
+            with open(state_path, "w") as f:  # checkpoint only after the page is committed
+                json.dump(dict(last_artwork_id=last_id, model=features.embeddings_api.embed_model.name), f)
+            record_failures(failed_path, failures)
+            done += len(updates)
+            print(f"Re-featurized {done} artworks (last {last_id}, {len(failures)} failed in this page)")
+    finally:
+        await features.close()
+        await close_db()
+    if os.path.exists(state_path):
+        os.remove(state_path)  # finished: the next run starts from the beginning
+    print(f"Done: {done} artworks re-featurized")
+
+
+async def rescore_classifiers(page_size=Config.backfill_checkpoint_every * 8):
+    """
+    Recompute abstract/noisy/paint of every artwork from its stored embedding (after retraining
+    the classifiers): no image is downloaded, each page is scored with one matmul.
+    """
+    from db import get_connection, close_db
+    from models_db import ArtworkDB
+    from src.classifiers_api import ClassifiersApi
+    from src.vector_codec import decode_vectors
+    from src.resilience import db_retry
+
+    classifiers = ClassifiersApi()
+    dim = classifiers.weights.shape[0]
+    last_id = None
+    done = 0
+    try:
+        while True:
+            async def next_page():
+                async with get_connection() as session:
+                    stmt = select(ArtworkDB.artwork_id, ArtworkDB.embeddings_bin, ArtworkDB.embeddings).order_by(ArtworkDB.artwork_id).limit(page_size)
+                    if last_id is not None:
+                        stmt = stmt.where(ArtworkDB.artwork_id > last_id)
+                    return (await session.execute(stmt)).all()
+
+            rows = await db_retry(next_page, name="Reading embeddings")
+            if not rows:
+                break
+            embeddings = decode_vectors([row[1] for row in rows], [row[2] for row in rows], dim)
+            scores = classifiers.predict_matrix(embeddings)
+            has_embedding = np.isfinite(embeddings).all(axis=1)  # rows without a stored embedding decode to NaN
+            updates = [
+                dict(artwork_id=row[0], **{cls: float(score) for cls, score in zip(classifiers.classes, row_scores)})
+                for row, row_scores, ok in zip(rows, scores, has_embedding) if ok
+            ]
+
+            async def write_page():
+                async with get_connection() as session:
+                    if updates:
+                        await session.execute(update(ArtworkDB), updates)
+                    await session.commit()
+
+            await db_retry(write_page, name="Updating classifier scores")
+            last_id = rows[-1][0]
+            done += len(updates)
+            print(f"Re-scored {done} artworks (last {last_id})")
+    finally:
+        await close_db()
+    print(f"Done: {done} artworks re-scored")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("target", choices=["stores", "artworks", "classifiers"])
+    parser.add_argument("--checkpoint-every", type=int, default=Config.backfill_checkpoint_every)
+    parser.add_argument("--retry-failed", action="store_true", help="try ids recorded as failed again")
+    parser.add_argument("--restart", action="store_true", help="artworks: ignore the saved checkpoint")
+    args = parser.parse_args()
+
+    if args.target == "stores":
+        from src.embedding_store import open_store
+        from utils.get_walls_artwork_pairs import fetch_wall_selections, extract_positive_data
+        wall_to_positive = extract_positive_data(await fetch_wall_selections())
+        await backfill_training_stores(
+            wall_to_positive, open_store(Config.wall_embeddings_path), open_store(Config.art_embeddings_path),
+            checkpoint_every=args.checkpoint_every, retry_failed=args.retry_failed
+        )
+    elif args.target == "classifiers":
+        await rescore_classifiers()
+    else:
+        await refeaturize_artworks(checkpoint_every=args.checkpoint_every, restart=args.restart, retry_failed=args.retry_failed)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
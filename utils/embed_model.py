@@ -6,13 +6,23 @@ from sklearn.preprocessing import normalize
 import requests
 from io import BytesIO
 
-def load_image(path_or_url):
+from src.config import Config
+from src.embedding_cache import EmbeddingCache, CONTENT_HASH_KEY, content_hash, image_key
+from src.cpu_inference import optimize_for_cpu
+
+def load_bytes(path_or_url) -> bytes:
     if path_or_url.startswith('http://') or path_or_url.startswith('https://'):
         response = requests.get(path_or_url)
         response.raise_for_status()
-        return Image.open(BytesIO(response.content)).convert("RGB")
-    else:
-        return Image.open(path_or_url).convert("RGB")
+        return response.content
+    with open(path_or_url, "rb") as f:
+        return f.read()
+
+def load_image(path_or_url):
+    data = load_bytes(path_or_url)
+    image = Image.open(BytesIO(data)).convert("RGB")
+    image.info[CONTENT_HASH_KEY] = content_hash(data)
+    return image
 
 class ConfigClip:
 	def __init__(self):
@@ -37,12 +47,33 @@ class ClipEmbed:
 		self.dim = 768
 		self.model, self.model_preprocess = clip.load(self.name, device=config.device)
 		self.model.eval()
+		self.inference_mode = Config.clip_cpu_inference_mode if self.device == 'cpu' else 'fp32'
+		if self.inference_mode != 'fp32':
+			# encode_image only runs model.visual; quantized / compiled vectors get their own cache
+			self.model.visual = optimize_for_cpu(self.model.visual, self.inference_mode, inplace=True)
+		cache_name = f"clip-{self.name}" if self.inference_mode == 'fp32' else f"clip-{self.name}-{self.inference_mode}"
+		self.cache = EmbeddingCache(cache_name, self.dim) if Config.embedding_cache_enabled else None
 	
 	def predict_imgs(self, urls: list[str]) -> np.ndarray:
 		# imgs = self.preprocessing(urls)
 		
-		imgs = [self.model_preprocess(load_image(img_path)) for img_path in urls]
-		imgs = torch.stack(imgs).to(self.device)
+		return self.predict_images([load_image(img_path) for img_path in urls])
+	
+	def predict_images(self, images: list[Image.Image]) -> np.ndarray:
+		"""images decoded with a content hash (load_image / ingest.decode_image) are looked up in the cache first"""
+		if self.cache is None:
+			return self.encode_tensors([self.preprocess(image) for image in images])
+		return self.cache.get_or_compute(
+			[image_key(image) for image in images],
+			lambda missing: self.encode_tensors([self.preprocess(images[i]) for i in missing])
+		)
+	
+	def preprocess(self, image: Image.Image) -> torch.Tensor:
+		return self.model_preprocess(image)
+	
+	def encode_tensors(self, tensors: list[torch.Tensor]) -> np.ndarray:
+		"""one encode_image forward pass over a batch of preprocessed images"""
+		imgs = torch.stack(tensors).to(self.device)
 		
 		with torch.no_grad():
 			embedding = self.model.encode_image(imgs)
@@ -2,14 +2,14 @@ import os
 import sys
 import asyncio
 import random
-import pickle
+import numpy as np
 from tqdm import tqdm
 from sqlalchemy.ext.asyncio import create_async_engine
 from sqlalchemy import text
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from src.config import Config
-from utils.embed_model import ClipEmbed
+from src.embedding_store import open_store
 # from src.colors_api import ColorsApi
 
 
@@ -40,9 +40,9 @@ def extract_positive_data(rows):
 
 def create_balanced_pairs(wall_to_positive, neg_ratio=1.0):
     pairs, labels = [], {}
+    all_positive_ids = set().union(*wall_to_positive.values())
     for wall, pos_ids in wall_to_positive.items():
         pos_set = set(pos_ids)
-        all_positive_ids = set().union(*wall_to_positive.values())
         neg_pool = list(all_positive_ids - pos_set)
         num_neg = min(int(len(pos_ids) * neg_ratio), len(neg_pool))
 
@@ -62,19 +62,15 @@ async def load_wall_artwork_pairs(neg_ratio=1.0):
     pairs, labels = create_balanced_pairs(wall_to_positive, neg_ratio)
     return pairs, labels
 
-def save_embeddings(wall_embeddings, art_embeddings, path="embeddings_cache"):
-    os.makedirs(path, exist_ok=True)
-    with open(os.path.join(path, "wall_embeddings.pkl"), "wb") as f:
-        pickle.dump(wall_embeddings, f)
-    with open(os.path.join(path, "art_embeddings.pkl"), "wb") as f:
-        pickle.dump(art_embeddings, f)
+def save_embeddings(wall_embeddings, art_embeddings, wall_path=Config.wall_embeddings_path, art_path=Config.art_embeddings_path):
+    """Appends the ids not stored yet; existing rows are never rewritten."""
+    for path, embeddings in ((wall_path, wall_embeddings), (art_path, art_embeddings)):
+        if embeddings:
+            open_store(path).append(list(embeddings.keys()), np.stack(list(embeddings.values())))
 
-def load_embeddings(wall_path, art_path):
-    with open(wall_path, "rb") as f:
-        wall_embeddings = pickle.load(f)
-    with open(art_path, "rb") as f:
-        art_embeddings = pickle.load(f)
-    return wall_embeddings, art_embeddings
+def load_embeddings(wall_path=Config.wall_embeddings_path, art_path=Config.art_embeddings_path):
+    """dict[id -> vector] views over the memory-mapped stores (no copy)."""
+    return open_store(wall_path).as_dict(), open_store(art_path).as_dict()
 
 def create_embedding_pairs(pairs, wall_embeddings, art_embeddings):
     """Return dict: {wall,art} → (wall_emb, art_emb)"""
@@ -85,84 +81,116 @@ def create_embedding_pairs(pairs, wall_embeddings, art_embeddings):
         embeddings_pairs[key] = (wall_embeddings[wall_id], art_embeddings[art_id])
     return embeddings_pairs
 
-def create_embedding_pairs_from_files(wall_path, art_path):
+class PairIndex:
+    """
+    Wall/art training pairs as integer row indices into the wall and art embedding
+    matrices; features are gathered per batch, the (n_pairs, 1536) matrix is never built.
+    """
+
+    def __init__(self, wall_rows, art_rows, labels, wall_matrix, art_matrix):
+        self.wall_rows = wall_rows
+        self.art_rows = art_rows
+        self.labels = labels
+        self.wall_matrix = wall_matrix
+        self.art_matrix = art_matrix
+
+    def __len__(self):
+        return len(self.labels)
+
+    @property
+    def input_dim(self) -> int:
+        return self.wall_matrix.shape[1] + self.art_matrix.shape[1]
+
+    def subset(self, positions):
+        return PairIndex(self.wall_rows[positions], self.art_rows[positions], self.labels[positions], self.wall_matrix, self.art_matrix)
+
+    def features(self, positions) -> np.ndarray:
+        """(len(positions), 1536) [wall | art] rows, gathered on demand."""
+        walls = np.asarray(self.wall_matrix[self.wall_rows[positions]], dtype=np.float32)
+        arts = np.asarray(self.art_matrix[self.art_rows[positions]], dtype=np.float32)
+        return np.concatenate([walls, arts], axis=1)
+
+def sample_negatives(rng, pool_size: int, positives: np.ndarray, n: int) -> np.ndarray:
+    """
+    n distinct positions in range(pool_size) outside `positives`, uniformly at random, in
+    O(n + len(positives)) expected time: draw, drop excluded and repeated draws, top up.
+    """
+    if n <= 0:
+        return np.empty(0, dtype=np.int64)
+    if 2 * (n + len(positives)) > pool_size:
+        # dense (small pool): the complement is at most ~2n long
+        return rng.choice(np.setdiff1d(np.arange(pool_size), positives), n, replace=False)
+    chosen = np.empty(0, dtype=np.int64)
+    while len(chosen) < n:
+        draws = rng.integers(0, pool_size, 2 * (n - len(chosen)))
+        draws = draws[~np.isin(draws, positives) & ~np.isin(draws, chosen)]
+        _, first = np.unique(draws, return_index=True)  # first occurrence keeps the draw order random
+        chosen = np.concatenate([chosen, draws[np.sort(first)]])[:n]
+    return chosen
+
+
+def build_pair_index(wall_to_positive, wall_store, art_store, neg_ratio=3, seed=None) -> PairIndex:
+    """
+    Positives: every (wall, selected art) with both embeddings stored. Negatives: per wall,
+    up to neg_ratio x its positives drawn without replacement from the arts selected for
+    other walls. Linear in the number of pairs (no walls x pool matrix).
+    """
+    rng = np.random.default_rng(seed)
+    art_row = {art_id: row for row, art_id in enumerate(art_store.ids)}
+    wall_row = {wall_id: row for row, wall_id in enumerate(wall_store.ids)}
+    walls = [wall_id for wall_id in wall_to_positive if wall_id in wall_row]
+
+    # pool = every selected art that has an embedding (store rows); sampling works on pool positions
+    pool = np.unique([art_row[art_id] for selected in wall_to_positive.values() for art_id in selected if art_id in art_row])
+    pos_walls, pos_arts, neg_walls, neg_arts = [], [], [], []
+    for wall_id in walls:
+        positives = np.unique(np.searchsorted(pool, [art_row[art_id] for art_id in wall_to_positive[wall_id] if art_id in art_row]))
+        negatives = sample_negatives(rng, len(pool), positives, min(len(positives) * neg_ratio, len(pool) - len(positives)))
+        pos_walls.append(np.full(len(positives), wall_row[wall_id], dtype=np.int64))
+        pos_arts.append(pool[positives])
+        neg_walls.append(np.full(len(negatives), wall_row[wall_id], dtype=np.int64))
+        neg_arts.append(pool[negatives])
+
+    n_pos = sum(map(len, pos_arts))
+    n_neg = sum(map(len, neg_arts))
+    return PairIndex(
+        wall_rows=np.concatenate(pos_walls + neg_walls) if walls else np.empty(0, dtype=np.int64),
+        art_rows=np.concatenate(pos_arts + neg_arts).astype(np.int64) if walls else np.empty(0, dtype=np.int64),
+        labels=np.concatenate([np.ones(n_pos, dtype=np.float32), np.zeros(n_neg, dtype=np.float32)]),
+        wall_matrix=wall_store.matrix(),
+        art_matrix=art_store.matrix()
+    )
+
+def load_pair_index(wall_path=Config.wall_embeddings_path, art_path=Config.art_embeddings_path, neg_ratio=3, seed=None) -> PairIndex:
     rows = asyncio.run(fetch_wall_selections())
     wall_to_positive = extract_positive_data(rows)
 
     # Update embeddings only if new IDs appear
-    wall_embeddings, art_embeddings = asyncio.run(
+    wall_store, art_store = asyncio.run(
         update_embeddings_if_needed(wall_path, art_path, wall_to_positive)
     )
 
-    return create_pairs_from_embeddings(wall_embeddings, art_embeddings, wall_to_positive)
-
-def create_pairs_from_embeddings(wall_embeddings, art_embeddings, wall_to_positive):
-    emb_pairs, labels = {}, {}
-
-    for wall_id, selected in wall_to_positive.items():
-        all_positive_ids = set().union(*wall_to_positive.values())
-
-        for art_id in selected:
-            if wall_id in wall_embeddings and art_id in art_embeddings:
-                key = f"{wall_id},{art_id}"
-                emb_pairs[key] = (wall_embeddings[wall_id], art_embeddings[art_id])
-                labels[key] = 1
-
-        neg_candidates = list(all_positive_ids - set(selected))
-        sampled_neg = random.sample(neg_candidates, min(len(neg_candidates), len(selected) * 3))
-
-        for art_id in sampled_neg:
-            if wall_id in wall_embeddings and art_id in art_embeddings:
-                key = f"{wall_id},{art_id}"
-                emb_pairs[key] = (wall_embeddings[wall_id], art_embeddings[art_id])
-                labels[key] = 0
-
-    return emb_pairs, labels
+    return build_pair_index(wall_to_positive, wall_store, art_store, neg_ratio=neg_ratio, seed=seed)
 
 async def update_embeddings_if_needed(wall_path, art_path, wall_to_positive):
     """Ensure embeddings cache contains all required walls/artworks."""
 
-    # Load existing if available
-    wall_embeddings = {}
-    art_embeddings = {}
-    if os.path.exists(wall_path):
-        with open(wall_path, "rb") as f:
-            wall_embeddings = pickle.load(f)
-    if os.path.exists(art_path):
-        with open(art_path, "rb") as f:
-            art_embeddings = pickle.load(f)
+    wall_store = open_store(wall_path)
+    art_store = open_store(art_path)
 
     # Required IDs from DB
     required_walls = set(wall_to_positive.keys())
     required_arts = set().union(*wall_to_positive.values())
 
     # Missing IDs
-    missing_walls = required_walls - wall_embeddings.keys()
-    missing_arts = required_arts - art_embeddings.keys()
+    missing_walls = {wall_id for wall_id in required_walls if wall_id not in wall_store}
+    missing_arts = {art_id for art_id in required_arts if art_id not in art_store}
 
     if missing_walls or missing_arts:
         print(f"⚡ Found {len(missing_walls)} missing walls, {len(missing_arts)} missing artworks. Embedding now...")
-        clip = ClipEmbed()
-
-        # Embed missing walls
-        for wall_id in tqdm(missing_walls, desc="Embedding new walls"):
-            while True:
-                try:
-                    path = f"{Config.walls_url}{wall_id + 1}.jpg"
-                    wall_embeddings[wall_id] = clip.predict_imgs([path])[0]
-                    break
-                except Exception as e:
-                    print(f"Failed to embed wall {wall_id}: {e}, retrying in 0.5s...")
-                    await asyncio.sleep(0.5)
-
-        # Embed missing artworks
-        for art_id in tqdm(missing_arts, desc="Embedding new artworks"):
-            path = f"{Config.images_url}{art_id}.jpg"
-            art_embeddings[art_id] = clip.predict_imgs([path])[0]
-
-        # Save updated cache
-        save_embeddings(wall_embeddings, art_embeddings, path=os.path.dirname(wall_path))
+        from utils.backfill_embeddings import backfill_training_stores
+        await backfill_training_stores(wall_to_positive, wall_store, art_store)
     else:
         print("✅ No new embeddings needed. Using cached files.")
 
-    return wall_embeddings, art_embeddings
\ No newline at end of file
+    return wall_store, art_store
\ No newline at end of file
@@ -0,0 +1,54 @@
+"""
+Schema migration for existing deployments: removes duplicate (user_id, artwork_id, action)
+rows from user_interactions (keeping the oldest) and creates the unique index that the
+INSERT ... ON CONFLICT DO NOTHING write path relies on. The index is built CONCURRENTLY,
+so the table stays writable during the migration. Safe to re-run.
+
+    python utils/migrate_interaction_indexes.py
+"""
+import os
+import sys
+import asyncio
+from sqlalchemy import text
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from db import engine
+
+INDEX_NAME = "uq_user_interactions_user_artwork_action"
+
+
+async def remove_duplicates():
+    async with engine.begin() as conn:
+        result = await conn.execute(text(
+            "DELETE FROM user_interactions a USING user_interactions b "
+            "WHERE a.id > b.id AND a.user_id = b.user_id AND a.artwork_id = b.artwork_id AND a.action = b.action"
+        ))
+        print(f"Removed {result.rowcount} duplicate interactions")
+
+
+async def create_index():
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        # a previous interrupted CONCURRENTLY build leaves an INVALID index behind
+        invalid = await conn.execute(text(
+            "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE c.relname = :name AND NOT i.indisvalid"
+        ), {"name": INDEX_NAME})
+        if invalid.first():
+            await conn.execute(text(f"DROP INDEX CONCURRENTLY {INDEX_NAME}"))
+        await conn.execute(text(
+            f"CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {INDEX_NAME} "
+            "ON user_interactions (user_id, artwork_id, action)"
+        ))
+        await conn.execute(text("ANALYZE user_interactions"))
+        print(f"Index {INDEX_NAME} ready")
+
+
+async def main():
+    await remove_duplicates()
+    await create_index()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
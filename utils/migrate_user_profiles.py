@@ -0,0 +1,35 @@
+"""
+Schema migration for existing deployments: user_profiles gains a version column
+(optimistic locking between processes) and stores the seen ids as text[] arrays
+that are appended to instead of rewritten. The table only holds data derived from
+user_interactions, so it is dropped and recreated; each user's profile is rebuilt
+from their history on their next request. Safe to re-run.
+
+    python utils/migrate_user_profiles.py
+"""
+import os
+import sys
+import asyncio
+from sqlalchemy import text
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from db import engine
+from models_db import UserProfileDB
+
+
+async def main():
+    async with engine.begin() as conn:
+        migrated = await conn.execute(text(
+            "SELECT 1 FROM information_schema.columns WHERE table_name = 'user_profiles' AND column_name = 'version'"
+        ))
+        if migrated.first():
+            print("user_profiles already migrated")
+        else:
+            await conn.execute(text("DROP TABLE IF EXISTS user_profiles"))
+            await conn.run_sync(UserProfileDB.__table__.create)
+            print("user_profiles recreated; profiles are rebuilt from user_interactions on demand")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,80 @@
+"""
+Adds the float32 bytea columns (embeddings_bin, colors_bin) to an existing artworks
+table and backfills them from the JSON columns in batches. Safe to re-run: only rows
+whose embeddings_bin is still NULL are touched.
+
+    python utils/migrate_vectors_to_binary.py --batch-size 500
+    python utils/migrate_vectors_to_binary.py --drop-json   # afterwards: NULL the JSON copies
+"""
+import os
+import sys
+import asyncio
+import argparse
+from tqdm import tqdm
+from sqlalchemy import text, select, update, func
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from db import engine, get_connection
+from models_db import ArtworkDB
+from src.vector_codec import encode_vector
+
+
+async def add_columns():
+    async with engine.begin() as conn:
+        await conn.execute(text("ALTER TABLE artworks ADD COLUMN IF NOT EXISTS embeddings_bin BYTEA"))
+        await conn.execute(text("ALTER TABLE artworks ADD COLUMN IF NOT EXISTS colors_bin BYTEA"))
+
+
+async def backfill(batch_size: int):
+    pending = ArtworkDB.embeddings_bin.is_(None) & ArtworkDB.embeddings.isnot(None)
+    async with get_connection() as session:
+        total = (await session.execute(select(func.count()).select_from(ArtworkDB).where(pending))).scalar_one()
+
+    with tqdm(total=total, desc="Backfilling binary vectors") as progress:
+        while True:
+            async with get_connection() as session:
+                result = await session.execute(
+                    select(ArtworkDB.artwork_id, ArtworkDB.embeddings, ArtworkDB.colors)
+                    .where(pending)
+                    .order_by(ArtworkDB.artwork_id)
+                    .limit(batch_size)
+                )
+                rows = result.all()
+                if not rows:
+                    break
+                await session.execute(update(ArtworkDB), [
+                    dict(
+                        artwork_id=artwork_id,
+                        embeddings_bin=encode_vector(embeddings),
+                        colors_bin=encode_vector(colors) if colors is not None else None
+                    )
+                    for artwork_id, embeddings, colors in rows
+                ])
+                await session.commit()
+            progress.update(len(rows))
+
+
+async def drop_json():
+    async with engine.begin() as conn:
+        result = await conn.execute(text(
+            "UPDATE artworks SET embeddings = NULL, colors = NULL "
+            "WHERE embeddings_bin IS NOT NULL AND colors_bin IS NOT NULL AND embeddings IS NOT NULL"
+        ))
+        print(f"Cleared JSON vectors of {result.rowcount} rows; run VACUUM FULL artworks to reclaim the space.")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--drop-json", action="store_true", help="NULL the JSON columns of rows that have binary vectors")
+    args = parser.parse_args()
+
+    await add_columns()
+    await backfill(args.batch_size)
+    if args.drop_json:
+        await drop_json()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())